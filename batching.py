@@ -0,0 +1,145 @@
+import numpy as np
+from grid import Grid
+from culling import nearest_boxes
+
+# vertices closer than this are welded into one
+WELD_TOLERANCE = 1e-4
+
+
+class StaticBatch(Grid):
+    def __init__(self):
+        # one merged line mesh for every stationary grid, drawn with a single indexed call,
+        # its vertices are already in world coordinates
+        super().__init__(0)
+        self.members = {}
+        # hashed vertex index: quantized position -> merged vertex, with a count of the objects using it
+        self.vertex_index = {}
+        self.vertex_refs = np.zeros(0, dtype=np.int64)
+        self.vertex_colors = np.zeros((0, 3), dtype=np.float32)
+        self.size = 0
+        self.free = []
+        # undirected welded edge -> number of objects sharing it
+        self.edge_refs = {}
+        self.grid = np.zeros((0, 3), dtype=np.float32)
+        self.edges = np.zeros((0, 2), dtype=np.uint32)
+        # members and their boxes for ray casts, gathered lazily like the edges
+        self.ray_members = None
+
+    def __len__(self):
+        return len(self.members)
+
+    def __contains__(self, obj):
+        return id(obj) in self.members
+
+    @property
+    def vertex_count(self):
+        return self.size - len(self.free)
+
+    def add(self, obj):
+        if id(obj) in self.members:
+            return
+        data = obj.build_vertex_data()
+        if obj.origin is not None:
+            data[:, :3] += obj.origin
+        keys = np.round(data[:, :3] / WELD_TOLERANCE).astype(np.int64)
+        vertex_keys = list(zip(*keys.T.tolist()))
+        self.reserve(self.size + len(vertex_keys))
+        remap = np.empty(len(vertex_keys), dtype=np.uint32)
+        for i, key in enumerate(vertex_keys):
+            index = self.vertex_index.get(key)
+            if index is None:
+                # the first object to claim a position keeps its color there
+                if self.free:
+                    index = self.free.pop()
+                else:
+                    index = self.size
+                    self.size += 1
+                self.grid[index] = data[i, :3]
+                self.vertex_colors[index] = data[i, 3:]
+                self.vertex_index[key] = index
+            self.vertex_refs[index] += 1
+            remap[i] = index
+
+        # weld the object's edges and count each undirected edge once
+        welded = np.sort(remap[obj.edges], axis=1)
+        edge_keys = list(zip(*welded.T.tolist()))
+        for edge in edge_keys:
+            self.edge_refs[edge] = self.edge_refs.get(edge, 0) + 1
+        self.members[id(obj)] = (obj, vertex_keys, edge_keys, obj.bounds())
+        self.changed()
+
+    def remove(self, obj):
+        entry = self.members.pop(id(obj), None)
+        if entry is None:
+            return
+        _, vertex_keys, edge_keys, _ = entry
+        for edge in edge_keys:
+            self.edge_refs[edge] -= 1
+            if self.edge_refs[edge] == 0:
+                del self.edge_refs[edge]
+        for key in vertex_keys:
+            index = self.vertex_index[key]
+            self.vertex_refs[index] -= 1
+            if self.vertex_refs[index] == 0:
+                # freed slots are reused by later additions, nothing indexes them meanwhile
+                del self.vertex_index[key]
+                self.free.append(index)
+        self.changed()
+
+    def reserve(self, size):
+        # merged vertex storage grows by doubling so additions don't copy everything each time
+        if size <= len(self.grid):
+            return
+        capacity = max(size, 2 * len(self.grid))
+        for name in ("grid", "vertex_colors", "vertex_refs"):
+            old = getattr(self, name)
+            new = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:len(old)] = old
+            setattr(self, name, new)
+
+    def changed(self):
+        # the index list is regathered lazily, once for any number of additions and removals
+        self.edges = None
+        self.ray_members = None
+        self.stale = True
+        self.dirty = True
+        self.index_dirty = True
+
+    def prepare(self):
+        if self.edges is None:
+            self.edges = np.array(list(self.edge_refs), dtype=np.uint32).reshape(-1, 2)
+        super().prepare()
+
+    def build_vertex_data(self):
+        data = np.empty((self.size, 6), dtype=np.float32)
+        data[:, :3] = self.grid[:self.size]
+        data[:, 3:] = self.vertex_colors[:self.size]
+        return data
+
+    @property
+    def index_count(self):
+        return 2 * len(self.edge_refs)
+
+    def bounds(self):
+        used = self.grid[:self.size][self.vertex_refs[:self.size] > 0]
+        if used.size == 0:
+            return np.zeros((2, 3))
+        return np.stack([used.min(axis=0), used.max(axis=0)]).astype(np.float64)
+
+    def raycast(self, origins, directions, max_distance=np.inf):
+        # the merged mesh has holes between members, so rays are tested against each member's own box (or surface)
+        if self.ray_members is None:
+            entries = list(self.members.values())
+            boxes = np.array([entry[3] for entry in entries], dtype=np.float64).reshape(-1, 2, 3)
+            self.ray_members = ([entry[0] for entry in entries], boxes)
+        members, boxes = self.ray_members
+        distance, index, struck = nearest_boxes(origins, directions, boxes, members, max_distance)
+        distance[index < 0] = np.inf
+        return distance, struck
+
+    def move_grid(self, offset):
+        raise TypeError("a static batch does not move, move its members before adding them")
+
+    def draw(self, uploader=None):
+        if self.edge_refs:
+            super().draw(uploader)
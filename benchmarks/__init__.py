@@ -0,0 +1 @@
+# headless benchmarks for the math, geometry and frame loop hot paths, run with `python -m benchmarks`
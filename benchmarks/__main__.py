@@ -0,0 +1,36 @@
+import argparse
+import sys
+import offscreen
+
+offscreen.configure()
+
+from benchmarks import runner, suites
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="Run the headless benchmark suite.")
+    parser.add_argument("-o", "--output", help="write results as JSON to this path")
+    parser.add_argument("-b", "--baseline", help="compare against a saved JSON baseline")
+    parser.add_argument("-t", "--threshold", type=float, default=0.10, help="allowed slowdown before a regression (default 0.10)")
+    parser.add_argument("-k", "--filter", help="only run benchmarks whose name contains this string")
+    parser.add_argument("-n", "--samples", type=int, default=200, help="timed samples per benchmark")
+    args = parser.parse_args(argv)
+
+    results = runner.run(suites.BENCHMARKS, samples=args.samples, pattern=args.filter)
+    meta = {}
+    if suites._context is not None:
+        meta["gl"] = offscreen.renderer()
+    data = runner.report(results, meta)
+    if args.output:
+        runner.save(args.output, data)
+
+    if args.baseline:
+        regressions = runner.compare(runner.load(args.baseline), data, threshold=args.threshold)
+        if regressions:
+            print(f"{len(regressions)} regression(s): {', '.join(regressions)}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
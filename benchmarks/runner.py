@@ -0,0 +1,90 @@
+import json
+import platform
+import time
+import numpy as np
+
+PERCENTILES = (50, 90, 95, 99)
+
+
+def measure(fn, samples=200, min_sample_time=50e-6, warmup=3):
+    # time fn in batches long enough for the clock, returns per-call seconds for every sample
+    for _ in range(warmup):
+        fn()
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        if time.perf_counter() - start >= min_sample_time or number >= 1 << 20:
+            break
+        number *= 2
+
+    times = np.empty(samples)
+    for i in range(samples):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        times[i] = (time.perf_counter() - start) / number
+    return times, number
+
+
+def summarize(times, number):
+    # per-call statistics in microseconds
+    us = np.asarray(times) * 1e6
+    summary = {f"p{p}": float(np.percentile(us, p)) for p in PERCENTILES}
+    summary.update(mean=float(us.mean()), min=float(us.min()), max=float(us.max()),
+                   samples=int(us.size), number=int(number))
+    return summary
+
+
+def run(benchmarks, samples=200, pattern=None, log=print):
+    results = {}
+    for name, setup in benchmarks:
+        if pattern and pattern not in name:
+            continue
+        try:
+            fn = setup()
+        except RuntimeError as e:
+            # a benchmark whose environment is missing (e.g. no GL context) is recorded as skipped
+            results[name] = {"skipped": str(e)}
+            log(f"{name:<40} skipped: {e}")
+            continue
+        times, number = measure(fn, samples=samples)
+        results[name] = summarize(times, number)
+        log(f"{name:<40} p50 {results[name]['p50']:>12.2f} us   p99 {results[name]['p99']:>12.2f} us")
+    return results
+
+
+def report(results, meta=None):
+    return {
+        "meta": dict(python=platform.python_version(), numpy=np.__version__,
+                     machine=platform.machine(), system=platform.system(), **(meta or {})),
+        "results": results,
+    }
+
+
+def save(path, data):
+    with open(path, "w") as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+
+
+def load(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def compare(baseline, current, threshold=0.10, stat="p50", log=print):
+    # returns the names whose stat got slower than the baseline by more than threshold
+    regressions = []
+    base_results = baseline.get("results", {})
+    for name, result in current.get("results", {}).items():
+        base = base_results.get(name)
+        if not base or stat not in base or stat not in result:
+            continue
+        change = result[stat] / base[stat] - 1 if base[stat] else 0.0
+        flag = ""
+        if change > threshold:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        log(f"{name:<40} {base[stat]:>12.2f} -> {result[stat]:>12.2f} us  {change:+8.1%}{flag}")
+    return regressions
@@ -0,0 +1,151 @@
+import numpy as np
+import offscreen
+
+GRID_SIZES = (10, 100, 1000)
+
+_context = None
+
+
+def gl_context():
+    # one offscreen context shared by every GL benchmark
+    global _context
+    if _context is None:
+        try:
+            _context = offscreen.create_context()
+        except Exception as e:
+            raise RuntimeError(f"no offscreen GL context: {e}") from e
+    return _context
+
+
+def quaternion_mul():
+    from quaternion import Quaternion
+    x = Quaternion(np.array([1, 0, 0]), 0.2)
+    y = Quaternion(np.array([0, 1, 0]), 0.3)
+    z = Quaternion(np.array([0, 0, 1]), 0.1)
+    return lambda: x * y * z
+
+
+def quaternion_rotate():
+    from quaternion import Quaternion
+    q = Quaternion.from_axis_angle([1, 2, 3], 0.7)
+    v = np.array([1.0, 2.0, 3.0])
+    return lambda: q.rotate(v)
+
+
+def quaternion_to_matrix():
+    from quaternion import Quaternion
+    q = Quaternion.from_axis_angle([1, 2, 3], 0.7)
+    return q.to_matrix
+
+
+def quaternion_from_euler_angles():
+    from quaternion import Quaternion
+    return lambda: Quaternion.from_euler_angles(0.1, 0.2, 0.3)
+
+
+def quaternion_from_two_vectors():
+    from quaternion import Quaternion
+    return lambda: Quaternion.from_two_vectors([1.0, 0.0, 0.0], [0.0, 1.0, 1.0])
+
+
+def grid_create(grid_sq):
+    def setup():
+        from grid import Grid
+        grid = Grid()
+        grid.grid_sq = grid_sq
+        return grid.create_grid
+    return setup
+
+
+def grid_move(grid_sq):
+    def setup():
+        from grid import Grid
+        grid = Grid()
+        grid.grid_sq = grid_sq
+        return lambda: grid.move_grid((1, 0, 0))
+    return setup
+
+
+def world_construct_map(render_mode="geometry"):
+    def setup():
+        from world import World
+
+        def construct():
+            World(10, render_mode=render_mode).construct_map()
+        return construct
+    return setup
+
+
+def terrain_heightfield(grid_sq):
+    def setup():
+        from terrain import heightfield
+        return lambda: heightfield((1, 0, 2), grid_sq=grid_sq, map_size=grid_sq)
+    return setup
+
+
+def world_raycast():
+    from world import World
+    world = World(10)
+    world.construct_map()
+    rng = np.random.default_rng(0)
+    origins = rng.uniform(-15, 15, (1000, 3))
+    directions = rng.normal(size=(1000, 3))
+    return lambda: world.raycast(origins, directions)
+
+
+def scene_update():
+    from scene import SceneGraph, SceneNode
+    from quaternion import Quaternion
+    graph = SceneGraph()
+    nodes = [graph.add(SceneNode(translation=(i, 0, 0))) for i in range(1000)]
+    rotation = Quaternion.from_axis_angle([0, 1, 0], 0.3)
+
+    # move a thousand nodes and rebuild their world matrices
+    def update():
+        for node in nodes:
+            node.set_rotation(rotation)
+        graph.update()
+    return update
+
+
+def engine_frame():
+    gl_context()
+    from engine import Engine
+    engine = Engine(10, headless=True)
+    engine.fps = 0
+    return engine.update
+
+
+def engine_replay():
+    gl_context()
+    from engine import Engine
+    from replay import standard_flight_path, play_frame
+    from OpenGL.GL import glFinish
+    engine = Engine(10, headless=True)
+    path = standard_flight_path()
+    frame = [0]
+
+    # one frame of the standard flight path per call, looping at 60 fps virtual time
+    def step():
+        play_frame(engine, path, (frame[0] % (int(path.duration * 60) + 1)) / 60)
+        glFinish()
+        frame[0] += 1
+    return step
+
+
+BENCHMARKS = [
+    ("quaternion.mul", quaternion_mul),
+    ("quaternion.rotate", quaternion_rotate),
+    ("quaternion.to_matrix", quaternion_to_matrix),
+    ("quaternion.from_euler_angles", quaternion_from_euler_angles),
+    ("quaternion.from_two_vectors", quaternion_from_two_vectors),
+    *[(f"grid.create_grid[{n}]", grid_create(n)) for n in GRID_SIZES],
+    *[(f"grid.move_grid[{n}]", grid_move(n)) for n in GRID_SIZES],
+    ("world.construct_map", world_construct_map()),
+    ("world.construct_map[batched]", world_construct_map("batched")),
+    *[(f"terrain.heightfield[{n}]", terrain_heightfield(n)) for n in GRID_SIZES[:2]],
+    ("world.raycast[1000]", world_raycast),
+    ("scene.update[1000]", scene_update),
+    ("engine.update", engine_frame),
+    ("engine.replay", engine_replay),
+]
@@ -1,17 +1,62 @@
 import numpy as np
-from OpenGL.GL import glMatrixMode, glLoadIdentity, glRotatef, glTranslatef, GL_PROJECTION, GL_MODELVIEW
-from OpenGL.GLU import gluPerspective, gluLookAt
+from OpenGL.GL import glMatrixMode, glLoadMatrixf, GL_PROJECTION, GL_MODELVIEW
 from quaternion import Quaternion
+from culling import Frustum
+
+
+def perspective_matrix(fov, aspect, near, far):
+    # same matrix gluPerspective builds, for column vectors
+    f = 1 / np.tan(np.radians(fov) / 2)
+    return np.array([[f / aspect, 0, 0, 0],
+                     [0, f, 0, 0],
+                     [0, 0, (far + near) / (near - far), 2 * far * near / (near - far)],
+                     [0, 0, -1, 0]], dtype=np.float64)
 
 
 class Camera:
     def __init__(self, pos=np.array([0, 0, 0])):
+        # cached matrices, rebuilt only when orientation, position or viewport change
+        self.view_dirty = True
+        self.projection_dirty = True
+        self.view = None
+        self.projection = None
+        self.cached_frustum = None
+        self.viewport = None
+        self.angles = None
+        # interpolated (pos, rotation) to draw between simulation ticks, None draws the current state
+        self.render_pose = None
+        # floating render origin, the view matrix places the camera relative to it
+        self.origin = np.zeros(3)
         self.pos = pos
+        self.fov = 45
+        self.aspect = 16 / 9
+        self.near = 0.1
+        self.far = 100
         self.rotation_quaternion = Quaternion()
         self.x_axis = Quaternion(np.array([1, 0, 0]), 0)
         self.y_axis = Quaternion(np.array([0, 1, 0]), 0)
         self.z_axis = Quaternion(np.array([0, 0, 1]), 0)
 
+    @property
+    def pos(self):
+        return self._pos
+
+    @pos.setter
+    def pos(self, pos):
+        self._pos = pos
+        self.render_pose = None
+        self.view_dirty = True
+
+    @property
+    def rotation_quaternion(self):
+        return self._rotation_quaternion
+
+    @rotation_quaternion.setter
+    def rotation_quaternion(self, rotation_quaternion):
+        self._rotation_quaternion = rotation_quaternion
+        self.render_pose = None
+        self.view_dirty = True
+
     def get_rotation_quaternion(self, pitch, yaw, roll):
         #print("Rotation Angles: ", pitch, yaw, roll)
         self.y_axis = Quaternion(np.array([0, 1, 0]), yaw)
@@ -25,33 +70,105 @@ class Camera:
         return quaternion * vector_quaternion * quaternion.conjugate()
 
     def look(self, yaw, pitch, roll):
+        # unchanged angles keep the current orientation, no trig
+        if (yaw, pitch, roll) == self.angles:
+            return
+        self.angles = (yaw, pitch, roll)
         pitch = np.radians(pitch)
         yaw = np.radians(yaw)
         roll = np.radians(roll)
         self.rotation_quaternion = self.get_rotation_quaternion(pitch, yaw, roll)
 
+    def forward(self):
+        # the camera looks down its local -z axis
+        return -self.rotation_quaternion.to_matrix()[:, 2]
+
     def move(self, t, map_size=100):
-        offset = map_size // 2
-        forward = self.rotation_quaternion.to_np_array()
+        if t == 0:
+            return
+        forward = self.forward()
         new_pos = self.pos + forward * t
+        # an unbounded map (map_size None) lets the camera travel freely
+        if map_size is None:
+            self.pos = new_pos
+            return
+        offset = map_size // 2
         new_pos = np.clip(new_pos, -offset, offset)
         self.pos = new_pos
-        if self.pos[0] <= -offset or self.pos[0] >= offset or self.pos[1] <= -offset or self.pos[1] >= offset:
-            forward_xy = forward.copy()
-            forward_xy[2] = 0
-            forward_xy = forward_xy / np.linalg.norm(forward_xy)
-            self.rotation_quaternion = Quaternion(np.array([0, 0, 1]), forward_xy)
+        if self.pos[0] <= -offset or self.pos[0] >= offset or self.pos[2] <= -offset or self.pos[2] >= offset:
+            # y is up, so the heading along the ground drops the vertical part
+            forward_xz = forward.copy()
+            forward_xz[1] = 0
+            norm = np.linalg.norm(forward_xz)
+            if norm == 0:
+                return
+            # turn the camera's -z axis onto the flattened heading, a rotation about y
+            heading = forward_xz / norm
+            angle = np.arctan2(-heading[0], -heading[2])
+            self.rotation_quaternion = Quaternion(np.array([0, 1, 0]), angle)
+            self.angles = None
 
     def set_projection(self, width, height):
-        glMatrixMode(GL_PROJECTION)
-        glLoadIdentity()
-        gluPerspective(45, width/height, 0.1, 100)
-        glMatrixMode(GL_MODELVIEW)
+        viewport = (width, height, self.fov, self.near, self.far)
+        if viewport != self.viewport:
+            self.viewport = viewport
+            self.aspect = width/height
+            self.projection = perspective_matrix(self.fov, self.aspect, self.near, self.far)
+            self.projection_dirty = True
+        if self.projection_dirty:
+            glMatrixMode(GL_PROJECTION)
+            glLoadMatrixf(np.ascontiguousarray(self.projection.T, dtype=np.float32))
+            glMatrixMode(GL_MODELVIEW)
+            self.projection_dirty = False
+            self.cached_frustum = None
+
+    def interpolate(self, previous_pos, previous_rotation, alpha):
+        # draw the pose alpha of the way from the previous simulation state to the current one
+        if previous_rotation is self.rotation_quaternion and np.array_equal(previous_pos, self.pos):
+            if self.render_pose is not None:
+                self.render_pose = None
+                self.view_dirty = True
+            return
+        previous_pos = np.asarray(previous_pos, dtype=np.float64)
+        pos = previous_pos + (self.pos - previous_pos) * alpha
+        self.render_pose = (pos, previous_rotation.slerp(self.rotation_quaternion, alpha))
+        self.view_dirty = True
+
+    def eye(self):
+        # the position the view is drawn from
+        return self.pos if self.render_pose is None else self.render_pose[0]
+
+    def view_matrix(self):
+        # inverse of the camera transform: transposed rotation, then the negated position
+        if self.view_dirty:
+            pos, rotation = self.render_pose or (self.pos, self.rotation_quaternion)
+            rotation = rotation.to_matrix()
+            view = np.identity(4)
+            view[:3, :3] = rotation.T
+            view[:3, 3] = -rotation.T @ (np.asarray(pos, dtype=np.float64) - self.origin)
+            self.view = view
+            # glLoadMatrixf takes column-major floats
+            self.view_gl = np.ascontiguousarray(view.T, dtype=np.float32)
+            self.view_dirty = False
+            self.cached_frustum = None
+        return self.view
+
+    def rebase(self, origin):
+        self.origin = np.asarray(origin, dtype=np.float64)
+        self.view_dirty = True
 
     def set(self):
-        glLoadIdentity()
-        gluLookAt(self.pos[0], self.pos[1], self.pos[2],
-                    self.pos[0] + self.rotation_quaternion.x,
-                    self.pos[1] + self.rotation_quaternion.y,
-                    self.pos[2] + self.rotation_quaternion.z,
-                    self.y_axis.x, self.y_axis.y, self.y_axis.z)
+        self.view_matrix()
+        glLoadMatrixf(self.view_gl)
+
+    def frustum(self):
+        # the view frustum of what set() and set_projection() put on screen
+        view = self.view_matrix()
+        if self.cached_frustum is None:
+            if self.projection is None:
+                self.projection = perspective_matrix(self.fov, self.aspect, self.near, self.far)
+            # culling stays in world coordinates: undo the render origin shift in float64
+            translation = np.identity(4)
+            translation[:3, 3] = -self.origin
+            self.cached_frustum = Frustum.from_matrix(self.projection @ view @ translation)
+        return self.cached_frustum
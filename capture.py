@@ -0,0 +1,94 @@
+import ctypes
+import os
+import queue
+import threading
+from collections import deque
+import numpy as np
+import pygame
+from OpenGL.GL import glGenBuffers, glDeleteBuffers, glBindBuffer, glBufferData, glReadPixels, glMapBuffer, \
+    glUnmapBuffer, GL_PIXEL_PACK_BUFFER, GL_STREAM_READ, GL_READ_ONLY, GL_RGBA, GL_UNSIGNED_BYTE
+
+
+class FrameCapture:
+    def __init__(self, width, height, buffers=2):
+        # a ring of pixel pack buffers: each frame's readback is queued on the GPU and mapped a frame later
+        self.width = width
+        self.height = height
+        self.size = width * height * 4
+        self.pbos = [int(pbo) for pbo in np.atleast_1d(glGenBuffers(buffers))]
+        for pbo in self.pbos:
+            glBindBuffer(GL_PIXEL_PACK_BUFFER, pbo)
+            glBufferData(GL_PIXEL_PACK_BUFFER, self.size, None, GL_STREAM_READ)
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, 0)
+        self.pending = deque()
+        self.index = 0
+        self.frame = 0
+
+    def capture(self):
+        # start reading the current frame, return the oldest finished (frame number, pixels) or None
+        pbo = self.pbos[self.index]
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, pbo)
+        glReadPixels(0, 0, self.width, self.height, GL_RGBA, GL_UNSIGNED_BYTE, ctypes.c_void_p(0))
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, 0)
+        self.pending.append((self.frame, pbo))
+        self.index = (self.index + 1) % len(self.pbos)
+        self.frame += 1
+        if len(self.pending) < len(self.pbos):
+            return None
+        return self.read(*self.pending.popleft())
+
+    def read(self, frame, pbo):
+        # rows come back bottom-up, consumers flip them off the render thread
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, pbo)
+        address = glMapBuffer(GL_PIXEL_PACK_BUFFER, GL_READ_ONLY)
+        pixels = np.ctypeslib.as_array((ctypes.c_ubyte * self.size).from_address(address)).copy()
+        glUnmapBuffer(GL_PIXEL_PACK_BUFFER)
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, 0)
+        return frame, pixels.reshape(self.height, self.width, 4)
+
+    def flush(self):
+        # the frames still in flight, oldest first
+        frames = [self.read(*entry) for entry in self.pending]
+        self.pending.clear()
+        return frames
+
+    def release(self):
+        glDeleteBuffers(len(self.pbos), self.pbos)
+        self.pbos = []
+
+
+class FrameWriter:
+    def __init__(self, directory, format="png", queue_size=8):
+        # writes frames from a background thread, a full queue applies back pressure to the renderer
+        if format not in ("png", "raw"):
+            raise ValueError(f"unknown frame format {format!r}, use png or raw")
+        self.directory = directory
+        self.format = format
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.written = 0
+        os.makedirs(directory, exist_ok=True)
+        self.thread = threading.Thread(target=self.run, name="frame-writer", daemon=True)
+        self.thread.start()
+
+    def submit(self, frame, pixels):
+        self.queue.put((frame, pixels))
+
+    def run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+            frame, pixels = item
+            pixels = pixels[::-1]
+            path = os.path.join(self.directory, f"frame{frame:06d}.{self.format}")
+            if self.format == "raw":
+                np.ascontiguousarray(pixels).tofile(path)
+            else:
+                surface = pygame.image.frombuffer(np.ascontiguousarray(pixels).tobytes(),
+                                                  (pixels.shape[1], pixels.shape[0]), "RGBA")
+                pygame.image.save(surface, path)
+            self.written += 1
+
+    def close(self):
+        self.queue.put(None)
+        self.thread.join()
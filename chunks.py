@@ -0,0 +1,97 @@
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from grid import Grid
+from lod import LodGrid
+
+
+def build_grid_chunk(cell, map_size, grid_sq=10):
+    # default chunk: a grid centered on the cell, with its vertex data prepared off the render thread;
+    # vertices stay relative to the cell so they keep full float32 precision at any distance
+    grid = Grid(grid_sq)
+    grid.origin = np.array(cell, dtype=np.float64) * map_size
+    grid.prepare()
+    return grid
+
+
+def build_lod_chunk(cell, map_size, levels=3, grid_sq=10):
+    # a grid chunk with coarser copies for distant cells
+    grid = LodGrid(grid_sq, levels)
+    grid.origin = np.array(cell, dtype=np.float64) * map_size
+    grid.prepare()
+    return grid
+
+
+class ChunkManager:
+    def __init__(self, world, radius=1, cache_size=None, workers=2, builder=build_grid_chunk, release=None):
+        self.world = world
+        # evicted chunks go to release, which can defer freeing their GL buffers to the render thread
+        self.release = release or (lambda chunk: chunk.release())
+        self.radius = radius
+        # the cache always holds at least the loaded neighborhood, plus room for recently left chunks
+        neighborhood = (2 * radius + 1) ** 3
+        self.cache_size = max(cache_size or 2 * neighborhood, neighborhood)
+        self.builder = builder
+        self.chunks = OrderedDict()
+        self.pending = {}
+        self.center = None
+        self.wanted = []
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="chunk")
+
+    def cell_of(self, pos):
+        # chunks are centered on multiples of map_size
+        return tuple(int(c) for c in np.floor(np.asarray(pos, dtype=np.float64) / self.world.map_size + 0.5))
+
+    def cells_around(self, center):
+        r = range(-self.radius, self.radius + 1)
+        cells = [(center[0] + x, center[1] + y, center[2] + z) for x in r for y in r for z in r]
+        # build nearest chunks first
+        cells.sort(key=lambda cell: sum(abs(a - b) for a, b in zip(cell, center)))
+        return cells
+
+    def set_radius(self, radius):
+        # takes effect on the next update, chunks out of the new range stay cached until evicted
+        if radius != self.radius:
+            self.radius = radius
+            self.center = None
+
+    def update(self, pos):
+        center = self.cell_of(pos)
+        if center != self.center:
+            self.center = center
+            self.wanted = self.cells_around(center)
+            # drop builds for chunks that went out of range before they started
+            for cell in list(self.pending):
+                if cell not in self.wanted and self.pending[cell].cancel():
+                    del self.pending[cell]
+            for cell in self.wanted:
+                if cell in self.chunks:
+                    self.chunks.move_to_end(cell)
+                elif cell not in self.pending:
+                    self.pending[cell] = self.executor.submit(self.builder, cell, self.world.map_size)
+
+        # collect finished builds without waiting on the rest
+        for cell, future in list(self.pending.items()):
+            if future.done():
+                del self.pending[cell]
+                self.chunks[cell] = future.result()
+        self.evict()
+
+        objects = [self.chunks[cell] for cell in self.wanted if cell in self.chunks]
+        if objects != self.world.objects:
+            self.world.set_objects(objects)
+
+    def evict(self):
+        wanted = set(self.wanted)
+        while len(self.chunks) > self.cache_size:
+            cell = next((c for c in self.chunks if c not in wanted), None)
+            if cell is None:
+                break
+            self.release(self.chunks.pop(cell))
+
+    def close(self):
+        self.executor.shutdown(wait=True, cancel_futures=True)
+        for chunk in self.chunks.values():
+            chunk.release()
+        self.chunks.clear()
+        self.pending.clear()
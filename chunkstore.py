@@ -0,0 +1,155 @@
+import hashlib
+import json
+import os
+import queue
+import threading
+import numpy as np
+from grid import Grid
+from terrain import TerrainGrid
+
+# file layout: header, then fixed-size records of (cell, vertex data, edges[, normals]) appended in build order,
+# vertex positions relative to the cell's origin
+MAGIC = b"ECHK"
+VERSION = 2
+HEADER = np.dtype([("magic", "S4"), ("version", "<u2"), ("pad", "<u2"), ("params", "<u8"),
+                   ("vertices", "<u4"), ("edges", "<u4")])
+
+
+def params_hash(params):
+    # entries built with other generation parameters are invalid
+    digest = hashlib.blake2b(json.dumps(params, sort_keys=True).encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "little")
+
+
+def record_dtype(vertices, edges, normals=False):
+    # terrain records also keep the surface normals, so a loaded chunk is a full TerrainGrid again
+    fields = [("cell", "<i4", 3), ("pad", "<u4"), ("vertex_data", "<f4", (vertices, 6)), ("edges", "<u4", (edges, 2))]
+    if normals:
+        fields.append(("normals", "<f4", (vertices, 3)))
+    return np.dtype(fields)
+
+
+class ChunkStore:
+    def __init__(self, path, grid_sq=10, map_size=10, seed=None, **params):
+        self.path = path
+        self.grid_sq = grid_sq
+        self.map_size = map_size
+        self.params = dict(params, grid_sq=grid_sq, map_size=map_size, seed=seed)
+        self.hash = params_hash(self.params)
+        terrain = params.get("terrain")
+        self.terrain = terrain is not None
+        self.spacing = terrain.get("spacing", 1) if self.terrain else 1
+        # every chunk of one parameter set has the same vertex and edge counts, so records have a fixed size
+        vertices = (grid_sq + 1) ** 2
+        edges = 2 * grid_sq * (grid_sq + 1)
+        self.record = record_dtype(vertices, edges, self.terrain)
+        self.header = np.array([(MAGIC, VERSION, 0, self.hash, vertices, edges)], dtype=HEADER)
+        self.index = {}
+        self.count = 0
+        self.mapped = None
+        self.lock = threading.Lock()
+        self.open()
+
+        # appends run on one background writer, readers see a record once it is fully on disk
+        self.pending = set()
+        self.queue = queue.Queue()
+        self.writer = threading.Thread(target=self.run, name="chunk-store", daemon=True)
+        self.writer.start()
+
+    def open(self):
+        header = None
+        if os.path.exists(self.path) and os.path.getsize(self.path) >= HEADER.itemsize:
+            header = np.fromfile(self.path, dtype=HEADER, count=1)
+        if header is None or header.tobytes() != self.header.tobytes():
+            # missing, foreign or built with different parameters: start over
+            with open(self.path, "wb") as f:
+                f.write(self.header.tobytes())
+            return
+        size = os.path.getsize(self.path) - HEADER.itemsize
+        count = size // self.record.itemsize
+        if count * self.record.itemsize != size:
+            # drop a record cut short by a crash mid-append
+            with open(self.path, "r+b") as f:
+                f.truncate(HEADER.itemsize + count * self.record.itemsize)
+        if count:
+            cells = self.map(count)["cell"]
+            self.index = {tuple(cell): slot for slot, cell in enumerate(cells.tolist())}
+        self.count = count
+
+    def map(self, count):
+        # read-only view of the first count records, pages load on first touch
+        self.mapped = np.memmap(self.path, dtype=self.record, mode="r", offset=HEADER.itemsize, shape=(count,))
+        return self.mapped
+
+    def __len__(self):
+        return self.count
+
+    def __contains__(self, cell):
+        return tuple(cell) in self.index
+
+    def get(self, cell):
+        # a grid backed directly by the mapped record, or None if the chunk isn't stored yet
+        with self.lock:
+            slot = self.index.get(tuple(cell))
+            if slot is None:
+                return None
+            mapped = self.mapped
+            if mapped is None or slot >= len(mapped):
+                mapped = self.map(self.count)
+        if self.terrain:
+            grid = TerrainGrid.from_vertex_data(mapped["vertex_data"][slot], mapped["edges"][slot], self.grid_sq,
+                                                self.spacing)
+            grid.normals = mapped["normals"][slot]
+        else:
+            grid = Grid.from_vertex_data(mapped["vertex_data"][slot], mapped["edges"][slot], self.grid_sq)
+        grid.origin = np.array(cell, dtype=np.float64) * self.map_size
+        return grid
+
+    def put(self, cell, grid):
+        cell = tuple(int(c) for c in cell)
+        grid.prepare()
+        if grid.vertex_data.shape != self.record["vertex_data"].shape or grid.edges.shape != self.record["edges"].shape:
+            raise ValueError(f"chunk {cell} doesn't match the store's grid_sq={self.grid_sq} layout")
+        if self.terrain and not isinstance(grid, TerrainGrid):
+            raise ValueError(f"chunk {cell} isn't a terrain chunk, the store holds terrain")
+        with self.lock:
+            if cell in self.index or cell in self.pending:
+                return
+            self.pending.add(cell)
+        self.queue.put((cell, grid.vertex_data, grid.edges, grid.normals if self.terrain else None))
+
+    def run(self):
+        with open(self.path, "ab") as f:
+            while True:
+                item = self.queue.get()
+                if item is None:
+                    break
+                cell, vertex_data, edges, normals = item
+                record = np.zeros(1, dtype=self.record)
+                record["cell"] = cell
+                record["vertex_data"] = vertex_data
+                record["edges"] = edges
+                if normals is not None:
+                    record["normals"] = normals
+                f.write(record.tobytes())
+                f.flush()
+                with self.lock:
+                    self.index[cell] = self.count
+                    self.count += 1
+                    self.pending.discard(cell)
+
+    def cached(self, builder):
+        # wrap a chunk builder so stored chunks load from disk and new ones are stored
+        def build(cell, map_size):
+            grid = self.get(cell)
+            if grid is None:
+                grid = builder(cell, map_size)
+                self.put(cell, grid)
+            return grid
+        return build
+
+    def close(self):
+        # waits for queued appends to reach the file
+        if self.writer.is_alive():
+            self.queue.put(None)
+            self.writer.join()
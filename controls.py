@@ -0,0 +1,28 @@
+import pygame
+
+
+class Controls:
+    def __init__(self, grab=True):
+        # relative mouse mode: a hidden, grabbed cursor reports unbounded motion without warping
+        if grab:
+            pygame.mouse.set_visible(False)
+            pygame.event.set_grab(True)
+        # motion is read once per frame from the accumulated relative state, not event by event
+        pygame.event.set_blocked(pygame.MOUSEMOTION)
+        pygame.mouse.get_rel()
+        self.quit = False
+        self.pressed = []
+        self.mouse_delta = (0, 0)
+
+    def poll(self):
+        # drain the queue once and coalesce this frame's input
+        self.pressed = []
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                self.quit = True
+            elif event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_ESCAPE:
+                    self.quit = True
+                self.pressed.append(event.key)
+        self.mouse_delta = pygame.mouse.get_rel()
+        return self
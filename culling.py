@@ -0,0 +1,261 @@
+import numpy as np
+
+
+class Frustum:
+    def __init__(self, planes):
+        # (6, 4) array of inward facing planes a*x + b*y + c*z + d >= 0
+        self.planes = np.asarray(planes, dtype=np.float64)
+
+    @classmethod
+    def from_matrix(cls, matrix):
+        # extract the clip planes of a combined projection * view matrix (column vectors)
+        m = np.asarray(matrix, dtype=np.float64)
+        planes = np.array([
+            m[3] + m[0],    # left
+            m[3] - m[0],    # right
+            m[3] + m[1],    # bottom
+            m[3] - m[1],    # top
+            m[3] + m[2],    # near
+            m[3] - m[2],    # far
+        ])
+        planes /= np.linalg.norm(planes[:, :3], axis=1, keepdims=True)
+        return cls(planes)
+
+    def intersects_boxes(self, boxes):
+        # boxes is (K, 2, 3) of min/max corners, returns a (K,) visibility mask
+        boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 2, 3)
+        normals = self.planes[:, :3]
+        # for each plane pick the box corner furthest along its normal
+        positive = np.where(normals[None, :, :] >= 0, boxes[:, None, 1, :], boxes[:, None, 0, :])
+        distances = np.einsum('kpi,pi->kp', positive, normals) + self.planes[:, 3]
+        return np.all(distances >= 0, axis=1)
+
+    def intersects_box(self, box):
+        return bool(self.intersects_boxes(box)[0])
+
+
+def ray_boxes(origins, directions, boxes):
+    # slab test of (R, 3) rays against (K, 2, 3) boxes, returns (R, K) entry distances, inf where missed
+    return ray_box_spans(origins, directions, boxes)[0]
+
+
+def ray_box_spans(origins, directions, boxes):
+    # (R, K) entry and exit distances of each ray through each box, both inf where missed
+    origins = np.asarray(origins, dtype=np.float64).reshape(-1, 3)
+    directions = np.asarray(directions, dtype=np.float64).reshape(-1, 3)
+    boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 2, 3)
+    # a tiny stand-in for zero components keeps parallel rays finite: always or never inside that slab
+    inverse = 1.0 / np.where(directions == 0, 1e-30, directions)
+    # (R, 3, K) so the per-axis reductions run over contiguous rows
+    lo = (boxes[:, 0, :].T[None] - origins[:, :, None]) * inverse[:, :, None]
+    hi = (boxes[:, 1, :].T[None] - origins[:, :, None]) * inverse[:, :, None]
+    t0 = np.minimum(lo, hi)
+    t1 = np.maximum(lo, hi)
+    near = np.maximum(np.maximum(t0[:, 0], t0[:, 1]), t0[:, 2])
+    far = np.minimum(np.minimum(t1[:, 0], t1[:, 1]), t1[:, 2])
+    hit = (near <= far) & (far >= 0)
+    return np.where(hit, np.maximum(near, 0), np.inf), np.where(hit, far, np.inf)
+
+
+def object_array(objects):
+    # a 1-d object array, filled one by one so numpy never unpacks an object that looks like a sequence
+    array = np.empty(len(objects), dtype=object)
+    for i, obj in enumerate(objects):
+        array[i] = obj
+    return array
+
+
+def nearest_boxes(origins, directions, boxes, objects, distance):
+    # nearest of (K, 2, 3) boxes closer than each ray's (R,) distance; an object with its own raycast
+    # refines its box hit to the surface inside it. Returns the (R,) distances, box index (-1 where
+    # nothing closer was found) and the object struck, which a refining object picks (e.g. a batch member)
+    objects = object_array(objects)
+    distance = np.array(np.broadcast_to(distance, origins.shape[:1]), dtype=np.float64)
+    index = np.full(origins.shape[0], -1)
+    struck = np.full(origins.shape[0], None, dtype=object)
+    t = ray_boxes(origins, directions, boxes)
+    narrow = np.array([hasattr(obj, 'raycast') for obj in objects], dtype=bool)
+
+    # plain boxes: the box is the surface
+    columns = np.flatnonzero(~narrow)
+    if columns.size:
+        nearest = columns[t[:, columns].argmin(axis=1)]
+        near = t[np.arange(t.shape[0]), nearest]
+        closer = near < distance
+        distance[closer] = near[closer]
+        index[closer] = nearest[closer]
+        struck[closer] = objects[nearest[closer]]
+
+    # refining objects, nearest box first, each only on the rays whose box entry beats the best hit so far
+    columns = np.flatnonzero(narrow)
+    for column in columns[np.argsort(t[:, columns].min(axis=0), kind='stable')]:
+        rays = np.flatnonzero(t[:, column] < distance)
+        if rays.size == 0:
+            continue
+        near, hits = objects[column].raycast(origins[rays], directions[rays], distance[rays])
+        closer = near < distance[rays]
+        rays = rays[closer]
+        distance[rays] = near[closer]
+        index[rays] = column
+        struck[rays] = hits[closer]
+    return distance, index, struck
+
+
+class PlaneIndex:
+    def __init__(self, height, indices, boxes):
+        # flat objects sharing the plane y = height, looked up by the (x, z) where a ray crosses it
+        self.height = height
+        self.indices = np.asarray(indices)
+        self.boxes = boxes[:, :, [0, 2]]
+        self.table = None
+        lo = self.boxes[:, 0]
+        extent = self.boxes[0, 1] - self.boxes[0, 0]
+        # equal tiles on a regular lattice (the usual chunk layout) become a dense uniform grid
+        if np.all(extent > 0) and np.allclose(self.boxes[:, 1] - lo, extent):
+            steps = (lo - lo.min(axis=0)) / extent
+            if np.allclose(steps, np.round(steps)):
+                self.origin = lo.min(axis=0)
+                self.extent = extent
+                cells = np.round(steps).astype(int)
+                self.table = np.full(cells.max(axis=0) + 1, -1)
+                # the first object on a tile wins
+                self.table[cells[::-1, 0], cells[::-1, 1]] = self.indices[::-1]
+
+    def lookup(self, points):
+        # object index covering each (P, 2) point, -1 where none does
+        if self.table is not None:
+            cells = np.floor((points - self.origin) / self.extent).astype(np.int64)
+            inside = np.all((cells >= 0) & (cells < self.table.shape), axis=1)
+            found = np.full(points.shape[0], -1)
+            found[inside] = self.table[cells[inside, 0], cells[inside, 1]]
+            return found
+        covered = np.all((points[:, None] >= self.boxes[None, :, 0]) & (points[:, None] <= self.boxes[None, :, 1]),
+                         axis=2)
+        return np.where(covered.any(axis=1), self.indices[covered.argmax(axis=1)], -1)
+
+
+class SpatialHash:
+    def __init__(self, cell_size):
+        self.cell_size = float(cell_size)
+        self.cells = {}
+        self.entries = {}
+        self.cell_keys = None
+        self.object_arrays = None
+
+    def cell_range(self, box):
+        lo = np.floor(np.asarray(box[0]) / self.cell_size).astype(int)
+        hi = np.floor(np.asarray(box[1]) / self.cell_size).astype(int)
+        return [(x, y, z)
+                for x in range(lo[0], hi[0] + 1)
+                for y in range(lo[1], hi[1] + 1)
+                for z in range(lo[2], hi[2] + 1)]
+
+    def insert(self, obj, box):
+        box = np.asarray(box, dtype=np.float64).reshape(2, 3)
+        if id(obj) in self.entries:
+            self.remove(obj)
+        keys = self.cell_range(box)
+        self.entries[id(obj)] = (obj, box, keys)
+        for key in keys:
+            self.cells.setdefault(key, []).append(obj)
+        self.cell_keys = None
+        self.object_arrays = None
+
+    def remove(self, obj):
+        entry = self.entries.pop(id(obj), None)
+        if entry is None:
+            return
+        for key in entry[2]:
+            bucket = self.cells[key]
+            bucket.remove(obj)
+            if not bucket:
+                del self.cells[key]
+        self.cell_keys = None
+        self.object_arrays = None
+
+    def clear(self):
+        self.cells.clear()
+        self.entries.clear()
+        self.cell_keys = None
+        self.object_arrays = None
+
+    def cell_arrays(self):
+        # occupied cell keys and their (C, 2, 3) boxes, cached until the index changes
+        if self.cell_keys is None:
+            self.cell_keys = list(self.cells)
+            lo = np.array(self.cell_keys, dtype=np.float64).reshape(-1, 3) * self.cell_size
+            self.cell_boxes = np.stack([lo, lo + self.cell_size], axis=1)
+        return self.cell_keys, self.cell_boxes
+
+    def boxes(self):
+        # every indexed object with its (K, 2, 3) boxes, flat boxes grouped into planes, cached until the index changes;
+        # objects with their own raycast are never planes, their box only bounds the surface
+        if self.object_arrays is None:
+            objects = object_array([entry[0] for entry in self.entries.values()])
+            boxes = np.array([entry[1] for entry in self.entries.values()]).reshape(-1, 2, 3)
+            narrow = np.array([hasattr(obj, 'raycast') for obj in objects], dtype=bool)
+            flat = (boxes[:, 0, 1] == boxes[:, 1, 1]) & ~narrow
+            planes = [PlaneIndex(height, np.flatnonzero(flat & (boxes[:, 0, 1] == height)),
+                                 boxes[flat & (boxes[:, 0, 1] == height)])
+                      for height in np.unique(boxes[flat, 0, 1])]
+            self.object_arrays = (objects, boxes, planes, np.flatnonzero(~flat))
+        return self.object_arrays
+
+    def raycast(self, origins, directions, max_distance=np.inf):
+        # nearest indexed object along each ray: (R,) distances (inf on a miss), object indices into boxes()
+        # (-1 on a miss) and the object struck, which is what a refining object reports (e.g. a batch member)
+        objects, boxes, planes, solid = self.boxes()
+        origins = np.asarray(origins, dtype=np.float64).reshape(-1, 3)
+        directions = np.asarray(directions, dtype=np.float64).reshape(-1, 3)
+        distance = np.full(origins.shape[0], float(max_distance))
+        index = np.full(origins.shape[0], -1)
+
+        # flat grids: one ray/plane test per distinct height, then a uniform grid lookup of the crossing point
+        with np.errstate(divide='ignore', invalid='ignore'):
+            for plane in planes:
+                t = (plane.height - origins[:, 1]) / directions[:, 1]
+                rays = np.flatnonzero((t >= 0) & (t <= distance))
+                if rays.size == 0:
+                    continue
+                points = origins[rays][:, [0, 2]] + directions[rays][:, [0, 2]] * t[rays, None]
+                found = plane.lookup(points)
+                rays = rays[found >= 0]
+                distance[rays] = t[rays]
+                index[rays] = found[found >= 0]
+
+        # everything else: slab tests against the boxes in hash cells some ray passes through
+        if solid.size:
+            keys, cell_boxes = self.cell_arrays()
+            crossed = np.flatnonzero((ray_boxes(origins, directions, cell_boxes) <= distance[:, None]).any(axis=0))
+            candidates = {id(obj) for i in crossed for obj in self.cells[keys[i]]}
+            solid = np.array([i for i in solid.tolist() if id(objects[i]) in candidates], dtype=np.int64)
+        struck = np.full(origins.shape[0], None, dtype=object)
+        refined = np.zeros(origins.shape[0], dtype=bool)
+        if solid.size:
+            distance, nearest, hits = nearest_boxes(origins, directions, boxes[solid], objects[solid], distance)
+            refined = nearest >= 0
+            index[refined] = solid[nearest[refined]]
+            struck[refined] = hits[refined]
+        planar = (index >= 0) & ~refined
+        struck[planar] = objects[index[planar]]
+        distance[index < 0] = np.inf
+        return distance, index, struck
+
+    def query(self, frustum):
+        if not self.cells:
+            return []
+        # test every occupied cell against the frustum in one pass
+        cell_keys, cell_boxes = self.cell_arrays()
+        visible_cells = np.flatnonzero(frustum.intersects_boxes(cell_boxes))
+
+        # gather the objects of visible cells once each, then test their own boxes
+        candidates = {}
+        for i in visible_cells:
+            for obj in self.cells[cell_keys[i]]:
+                candidates[id(obj)] = obj
+        if not candidates:
+            return []
+        objects = list(candidates.values())
+        boxes = np.array([self.entries[id(obj)][1] for obj in objects])
+        mask = frustum.intersects_boxes(boxes)
+        return [obj for obj, visible in zip(objects, mask) if visible]
@@ -1,18 +1,53 @@
+import os
+import time
+from functools import partial
+import numpy as np
 import pygame
-from OpenGL.GLU import gluPerspective
 from OpenGL.GL import *
 from pygame.locals import DOUBLEBUF, OPENGL
 from camera import Camera
 from world import World
+from chunks import ChunkManager, build_grid_chunk, build_lod_chunk
+from profiler import FrameProfiler, ProfilerOverlay
+from replay import PathRecorder
+from capture import FrameCapture, FrameWriter
+from offscreen import create_context
+from terrain import TerrainGenerator
+from chunkstore import ChunkStore
+from pipeline import FrameSnapshot, Pipeline
+from upload import UploadRing
+from quality import QualityController, ResolutionScaler, quality_levels
+
+# the simulation rate the speed and turn increments were tuned for
+BASE_TICK_RATE = 15
+# longest frame the simulation catches up on, so a stall doesn't snowball into more ticks
+MAX_FRAME_TIME = 0.25
 
 class Engine:
-    def __init__(self, map_size):
+    def __init__(self, map_size, endless=False, view_radius=1, headless=False, screen_size=(800, 600),
+                 profile=False, profile_log=None, lod_levels=1, render_mode="geometry", tick_rate=60, vsync=False,
+                 offscreen=False, capture=False, capture_dir=None, capture_format="png", frame_budget=None,
+                 terrain_seed=None, chunk_cache=None, pipelined=False,
+                 stream_uploads=False, rebase_distance=None, grid_sq=10):
         pygame.init()
-        # get the full size of the screen and set the display
-        self.screen_size = (pygame.display.Info().current_w, pygame.display.Info().current_h)
-        pygame.display.set_mode(self.screen_size, DOUBLEBUF|OPENGL)
-        pygame.mouse.set_visible(False)
-        gluPerspective(45, (self.screen_size[0]/self.screen_size[1]), 0.1, 1000.0)
+        self.context = None
+        if offscreen:
+            self.screen_size = screen_size
+            if os.environ.get("PYOPENGL_PLATFORM") in ("egl", "osmesa"):
+                # a surfaceless EGL or OSMesa context, pygame only provides input and timing
+                self.context = create_context(*screen_size)
+                pygame.display.set_mode(self.screen_size, pygame.HIDDEN)
+            else:
+                # render into the default framebuffer of a hidden window
+                pygame.display.set_mode(self.screen_size, DOUBLEBUF|OPENGL|pygame.HIDDEN)
+        elif headless:
+            # the caller owns the GL context, pygame only provides input and timing on a hidden surface
+            self.screen_size = screen_size
+            pygame.display.set_mode(self.screen_size, pygame.HIDDEN)
+        else:
+            # get the full size of the screen and set the display
+            self.screen_size = (pygame.display.Info().current_w, pygame.display.Info().current_h)
+            pygame.display.set_mode(self.screen_size, DOUBLEBUF|OPENGL, vsync=1 if vsync else 0)
 
         # set depth, culling and clipping
         glEnable(GL_DEPTH_TEST)
@@ -21,17 +56,47 @@ class Engine:
         glFrontFace(GL_CW)
         glEnable(GL_CLIP_DISTANCE0)
 
-        # # set the projection matrix
-        glMatrixMode(GL_PROJECTION)
-        glLoadIdentity()
-        gluPerspective(45, self.screen_size[0]/self.screen_size[1], 0.1, 100)
-        glMatrixMode(GL_MODELVIEW)
-
         self.screen_width = self.screen_size[0]
         self.screen_height = self.screen_size[1]
-        self.world = World(map_size)
-        self.world.construct_map()
+        # objects dropped while preparing a frame, freed by the GL thread when it submits that frame
+        self.releases = []
+        # heightfield chunks are generated across every core when a terrain seed is given
+        self.terrain = None
+        if terrain_seed is not None and render_mode == "geometry":
+            self.terrain = TerrainGenerator(terrain_seed, grid_sq=grid_sq, map_size=map_size)
+        # built chunks persist in a memory-mapped file, single level grids only
+        self.store = None
+        if chunk_cache and render_mode == "geometry" and lod_levels == 1:
+            terrain = self.terrain.params if self.terrain is not None else None
+            self.store = ChunkStore(chunk_cache, grid_sq=grid_sq, map_size=map_size, seed=terrain_seed,
+                                    terrain=terrain)
+        self.world = World(map_size, radius=view_radius, grid_sq=grid_sq, lod_levels=lod_levels,
+                           render_mode=render_mode, terrain=self.terrain, store=self.store)
+        # an endless world streams chunks around the camera instead of building a fixed map,
+        # the procedural render mode is endless by itself
+        self.endless = endless
+        self.chunks = None
+        if endless and render_mode == "geometry":
+            # streamed chunks are built at the world's density
+            if lod_levels > 1:
+                builder = partial(build_lod_chunk, levels=lod_levels, grid_sq=grid_sq)
+            else:
+                builder = partial(build_grid_chunk, grid_sq=grid_sq)
+            workers = 2
+            if self.terrain is not None:
+                builder = self.terrain.build
+                workers = self.terrain.workers
+            if self.store is not None:
+                builder = self.store.cached(builder)
+            self.chunks = ChunkManager(self.world, radius=view_radius, builder=builder, workers=workers,
+                                       release=self.releases.append)
+        else:
+            self.world.construct_map()
         self.camera = Camera()
+        # the render origin follows the camera whenever it strays this far, keeping GL coordinates small
+        self.rebase_distance = rebase_distance or 4 * map_size
+        # set the projection matrix
+        self.camera.set_projection(*self.screen_size)
         self.map_size = map_size
         self.prev_mouse_pos = (0, 0)
         self.acceleration = 0
@@ -40,6 +105,45 @@ class Engine:
         self.roll = 0
         self.max_acceleration = 3
         self.clock = pygame.time.Clock()
+        # frame rate cap, 0 runs uncapped (or at the vsync rate)
+        self.fps = 0
+        # the simulation advances in fixed ticks, rendering interpolates between the last two
+        self.tick_rate = tick_rate
+        self.accumulator = 0.0
+        self.last_time = None
+        self.previous_pos = self.camera.pos
+        self.previous_rotation = self.camera.rotation_quaternion
+        # frames read back through pixel buffers, handed to frame_sink(frame, pixels) a frame later
+        self.capture = None
+        self.writer = None
+        self.frame_sink = None
+        if capture or capture_dir:
+            self.capture = FrameCapture(*self.screen_size)
+        if capture_dir:
+            self.writer = FrameWriter(capture_dir, capture_format)
+            self.frame_sink = self.writer.submit
+        # captures the camera state every tick while recording a flight path
+        self.recorder = None
+        self.record_path = None
+        # per-stage frame timings, near free while disabled
+        self.profile = profile
+        self.profiler = FrameProfiler(enabled=profile)
+        self.profile_log = profile_log
+        self.overlay = None
+        # with a frame budget in seconds, detail, resolution and loaded radius adapt to hold it
+        self.quality = None
+        self.scaler = None
+        if frame_budget:
+            levels = quality_levels(view_radius, self.world.lod_bias, lod=lod_levels > 1,
+                                    streamed=self.chunks is not None)
+            self.quality = QualityController(frame_budget, levels)
+            self.scaler = ResolutionScaler(*self.screen_size)
+        # grid buffers stream through a fenced staging ring under a per-frame byte budget
+        self.uploader = None
+        if stream_uploads:
+            self.uploader = self.world.uploader = UploadRing()
+        # a simulation thread prepares frames while this one submits the previous one
+        self.pipeline = Pipeline(self) if pipelined else None
 
     # govern the speed of the camera
     def govern_speed(self, a):
@@ -56,7 +160,12 @@ class Engine:
         # determine the change in mouse position
         dx = x - self.prev_mouse_pos[0]
         dy = y - self.prev_mouse_pos[1]
+        self.turn(dx, dy)
 
+    # turn the camera by a relative mouse motion
+    def turn(self, dx, dy):
+        if not dx and not dy:
+            return
         self.yaw += dx / 3
         self.pitch += dy / 6
 
@@ -70,48 +179,218 @@ class Engine:
         elif self.yaw < -360:
             self.yaw = 0
 
-
-
     # move the camera based on key presses
     def navigate(self, key):
         # update the acceleration of the camera
         if key[pygame.K_w]:
-            self.govern_speed(self.acceleration + 0.01)
+            self.govern_speed(self.acceleration + 0.01 * self.step_scale)
             #print("moving forward at speed: ", self.acceleration)
             return
         if key[pygame.K_s]:
             #print("moving forward at speed: ", self.acceleration)
-            self.govern_speed(self.acceleration - 0.01)
+            self.govern_speed(self.acceleration - 0.01 * self.step_scale)
             return
 
         # TODO: fix the roll so that it doesn't go past 360 degrees or -360 degrees
         # update the roll of the camera
         if key[pygame.K_a]:
-            self.roll += 1
+            self.roll += self.step_scale
             return
         if key[pygame.K_d]:
-            self.roll -= 1
+            self.roll -= self.step_scale
             return
 
-    # update the camera location
-    def update(self):
+    # show or hide the on-screen profiler, profiling while it is visible
+    def toggle_overlay(self):
+        if self.overlay is None:
+            self.overlay = ProfilerOverlay(self.profiler, self.quality, self.uploader)
+            if not self.profiler.enabled:
+                self.profiler.reset()
+                self.profiler.enabled = True
+        else:
+            self.overlay = None
+            self.profiler.enabled = self.profile
+
+    # start recording the camera path, or stop and save it
+    def toggle_recording(self, path="flight.path"):
+        if self.recorder is None:
+            self.recorder = PathRecorder(self.tick_rate)
+            self.record_path = path
+        else:
+            # detach first, the simulation thread may be capturing a tick meanwhile
+            recorder, self.recorder = self.recorder, None
+            recorder.save(self.record_path)
+
+    # switch to the quality controller's latest settings
+    def apply_quality(self, settings):
+        self.world.lod_bias = settings["lod_bias"]
+        self.scaler.scale = settings["resolution_scale"]
+        # the loaded radius only shrinks a streamed world, a fixed map stays whole
+        if self.chunks is not None:
+            self.chunks.set_radius(settings["view_radius"])
+
+    # hand over the frames still being read back and stop background work
+    def close(self):
+        if self.pipeline is not None:
+            self.pipeline.stop()
+        if self.capture is not None:
+            for frame in self.capture.flush():
+                if self.frame_sink is not None:
+                    self.frame_sink(*frame)
+            self.capture.release()
+            self.capture = None
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+        if self.chunks is not None:
+            self.chunks.close()
+        if self.terrain is not None:
+            self.terrain.close()
+        if self.store is not None:
+            self.store.close()
+        if self.scaler is not None:
+            self.scaler.release()
+        if self.uploader is not None:
+            self.world.uploader = None
+            self.uploader.release()
+            self.uploader = None
+
+    # write the buffered frame timings to the profile log, if any
+    def dump_profile(self):
+        if self.profile_log and self.profiler.count:
+            self.profiler.dump(self.profile_log)
+
+    # scale of the per-tick increments relative to the rate they were tuned at
+    @property
+    def step_scale(self):
+        return BASE_TICK_RATE / self.tick_rate
+
+    # advance the simulation by one fixed tick
+    def simulate(self, key, profiler=None):
+        profiler = profiler or self.profiler
+        t = profiler.start()
+
         # move the camera based on key presses
-        if key := pygame.key.get_pressed():
+        if key:
             self.navigate(key)
+        t = profiler.lap("navigate", t)
 
-        print("yaw: ", self.yaw, " pitch: ", self.pitch, " roll: ", self.roll)
         # update the pitch, yaw and roll of the camera
         self.camera.look(self.yaw, self.pitch, self.roll)
+        t = profiler.lap("look", t)
 
         # update the camera location based on fwd, right, up
-        self.camera.move(self.acceleration, self.map_size)
+        self.camera.move(self.acceleration * self.step_scale, None if self.endless else self.map_size)
+        profiler.lap("move", t)
+
+        # read once, a pipelined engine can stop recording from the main thread between the check and the call
+        recorder = self.recorder
+        if recorder is not None:
+            recorder.capture(self.camera)
+
+    # run as many simulation ticks as the elapsed time calls for, then render
+    def update(self):
+        if self.pipeline is not None:
+            self.submit(self.pipeline.next())
+            return
+        self.render(self.advance())
+
+    # run the simulation ticks due since the last call, returns how far the render pose is into the next tick
+    def advance(self, profiler=None):
+        now = time.perf_counter()
+        frame_time = 0.0 if self.last_time is None else min(now - self.last_time, MAX_FRAME_TIME)
+        self.last_time = now
+
+        dt = 1 / self.tick_rate
+        self.accumulator += frame_time
+        if self.accumulator >= dt:
+            key = pygame.key.get_pressed()
+            while self.accumulator >= dt:
+                self.previous_pos = self.camera.pos
+                self.previous_rotation = self.camera.rotation_quaternion
+                self.simulate(key, profiler)
+                self.accumulator -= dt
+        return self.accumulator / dt
+
+    # draw the world from the camera pose alpha of the way between the last two ticks
+    def render(self, alpha=1.0):
+        self.submit(self.prepare_frame(alpha))
+
+    # the cpu side of a frame: stream chunks, place the camera and cull, without touching GL
+    def prepare_frame(self, alpha=1.0, profiler=None):
+        profiler = profiler or self.profiler
+        start = time.perf_counter()
+        t = profiler.start()
+
+        # load chunks around the camera and evict far ones
+        if self.chunks is not None:
+            self.chunks.update(self.camera.pos)
+        t = profiler.lap("move", t)
+
+        # update the cameras direction
+        self.rebase()
+        self.camera.interpolate(self.previous_pos, self.previous_rotation, alpha)
+        self.camera.view_matrix()
+        t = profiler.lap("set", t)
+
+        # collect the objects inside the camera's view
+        eye = self.camera.eye()
+        items = self.world.prepare_frame(self.camera.frustum(), eye)
+        releases, self.releases = self.releases, []
+        profiler.lap("render", t)
+        return FrameSnapshot(self.camera.view_gl, eye - self.world.origin, items, releases,
+                             time.perf_counter() - start)
+
+    # move the render origin to the chunk under the camera once the camera is far enough from it
+    def rebase(self):
+        if np.abs(self.camera.pos - self.world.origin).max() > self.rebase_distance:
+            origin = np.round(np.asarray(self.camera.pos, dtype=np.float64) / self.map_size) * self.map_size
+            self.world.rebase(origin)
+            self.camera.rebase(origin)
 
-        # update the cameras direction in opengl
-        self.camera.set()
+    # the GL side of a frame: draw a prepared snapshot and present it
+    def submit(self, snapshot):
+        profiler = self.profiler
+        t = profiler.start()
+        start = time.perf_counter()
+        for obj in snapshot.releases:
+            obj.release()
+        # stream what last frame's draws asked for before drawing this one
+        if self.uploader is not None:
+            self.uploader.begin_frame()
+            self.uploader.pump()
+        if self.scaler is not None:
+            self.scaler.begin()
+        glClear(GL_COLOR_BUFFER_BIT|GL_DEPTH_BUFFER_BIT)
+        glLoadMatrixf(snapshot.view_gl)
 
-        # render the world
-        self.world.render()
+        # render the objects inside the camera's view
+        self.world.submit(snapshot.items, snapshot.eye)
+        if self.scaler is not None:
+            self.scaler.end()
+        if self.uploader is not None:
+            self.uploader.end_frame()
+        if self.overlay is not None:
+            self.overlay.draw(self.screen_height)
+        if self.capture is not None:
+            frame = self.capture.capture()
+            if frame is not None and self.frame_sink is not None:
+                self.frame_sink(*frame)
+        t = profiler.lap("render", t)
 
         # update the display and tick the clock
         pygame.display.flip()
-        self.clock.tick(15)
+        profiler.lap("flip", t)
+        profiler.end_frame()
+        # the controller sees the frame's work, not the time spent waiting on the frame cap:
+        # preparing plus submitting, or the slower of the two when they overlap on separate threads
+        if self.quality is not None:
+            work = time.perf_counter() - start
+            if self.pipeline is None:
+                work += snapshot.prepare_time
+            else:
+                work = max(work, snapshot.prepare_time)
+            settings = self.quality.update(work)
+            if settings is not None:
+                self.apply_quality(settings)
+        self.clock.tick(self.fps)
@@ -1,4 +1,15 @@
-from OpenGL.GL import glBegin, glEnd, glColor3f, glVertex3fv, GL_LINES
+import ctypes
+import numpy as np
+from OpenGL.GL import glGenBuffers, glBindBuffer, glBufferData, glDeleteBuffers, \
+    glEnableClientState, glDisableClientState, glVertexPointer, glColorPointer, glDrawElements, \
+    glDrawElementsInstanced, glVertexAttribDivisor, glVertexAttribPointer, glEnableVertexAttribArray, \
+    glDisableVertexAttribArray, glGetAttribLocation, glUseProgram, glDeleteProgram, glPushMatrix, glPopMatrix, \
+    glTranslatef, GL_ARRAY_BUFFER, GL_ELEMENT_ARRAY_BUFFER, GL_STATIC_DRAW, GL_UNSIGNED_INT, GL_VERTEX_ARRAY, \
+    GL_COLOR_ARRAY, GL_FLOAT, GL_FALSE, GL_LINES, GL_VERTEX_SHADER, GL_FRAGMENT_SHADER, glDrawArrays, \
+    glGetUniformLocation, glUniform1f, glUniform3f, glIsEnabled, glEnable, glDisable, glBlendFunc, GL_BLEND, \
+    GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA, GL_TRIANGLES, GL_CULL_FACE
+from OpenGL.GL import shaders
+from OpenGL.error import GLError
 
 square = (
     (1, 0, 0),
@@ -14,45 +25,389 @@ edges = (
     (2,3),
     )
 
+# interleaved x, y, z, r, g, b float32 layout of the vertex buffer
+VERTEX_STRIDE = 6 * 4
+COLOR_OFFSET = 3 * 4
+
 
 class Grid:
-    def __init__(self):
-        self.grid = []
-        self.edges = []
-        self.grid_sq = 10
+    def __init__(self, grid_sq=10, spacing=1):
+        self.grid = None
+        self.edges = None
+        self._grid_sq = grid_sq
+        # distance between neighboring lines, coarser grids keep the same extent with fewer lines
+        self.spacing = spacing
+        # world position the vertices are relative to, None when they are in absolute world coordinates
+        self.origin = None
+        self.vertex_data = None
+        self.vbo = None
+        self.ibo = None
+        # indices the index buffer holds as last uploaded, edges can run ahead of it while an upload is queued
+        self.uploaded_count = 0
+        # the UploadRing streaming this grid's buffers, None when they upload on draw
+        self.uploader = None
+        self.stale = True
+        self.dirty = True
+        self.index_dirty = True
+        self.create_grid()
+
+    @classmethod
+    def from_vertex_data(cls, vertex_data, edges, grid_sq, spacing=1):
+        # wrap prebuilt interleaved vertex data and edges (e.g. a memory-mapped cache entry) without copying
+        grid = cls.__new__(cls)
+        grid._grid_sq = grid_sq
+        grid.spacing = spacing
+        grid.origin = None
+        grid.vertex_data = vertex_data
+        grid.grid = vertex_data[:, :3]
+        grid.edges = edges
+        grid.vbo = None
+        grid.ibo = None
+        grid.uploaded_count = 0
+        grid.uploader = None
+        grid.stale = False
+        grid.dirty = True
+        grid.index_dirty = True
+        return grid
+
+    @property
+    def grid_sq(self):
+        return self._grid_sq
+
+    @grid_sq.setter
+    def grid_sq(self, grid_sq):
+        # changing the density regenerates the lattice and its buffer
+        self._grid_sq = grid_sq
         self.create_grid()
-    
+
     def create_grid(self):
-        for j in range(self.grid_sq + 1):
-            for i in range(self.grid_sq + 1):
-                x = i - self.grid_sq // 2
-                z = j - self.grid_sq // 2
-                self.grid.append((x, 0, z))
-
-        verticals = []
-        for j in range(self.grid_sq + 1):
-            for i in range(self.grid_sq):
-                verticals.append((j * (self.grid_sq + 1) + i, j * (self.grid_sq + 1) + i + 1))
-        
-        horizontals = []
-        for j in range(self.grid_sq):
-            for i in range(self.grid_sq + 1):
-                horizontals.append((j * (self.grid_sq + 1) + i, (j + 1) * (self.grid_sq + 1) + i))
-        
-        # zip up verticals and horitzontals interlaced
-        self.edges = [val for pair in zip(verticals, horizontals) for val in pair]
-                
+        n = self.grid_sq
+        k = n + 1
+        # (k * k, 3) vertices, row j along z and column i along x
+        ticks = np.arange(k) * self.spacing - (n * self.spacing) // 2
+        x, z = np.meshgrid(ticks, ticks)
+        self.grid = np.zeros((k * k, 3), dtype=np.float32)
+        self.grid[:, 0] = x.ravel()
+        self.grid[:, 2] = z.ravel()
+
+        rows = np.arange(k, dtype=np.uint32)[:, None] * k
+        verticals = (rows + np.arange(n, dtype=np.uint32)).ravel()
+        horizontals = (rows[:n] + np.arange(k, dtype=np.uint32)).ravel()
+
+        # interlace verticals and horizontals into (E, 2) index pairs
+        self.edges = np.empty((verticals.size + horizontals.size, 2), dtype=np.uint32)
+        self.edges[0::2, 0] = verticals
+        self.edges[0::2, 1] = verticals + 1
+        self.edges[1::2, 0] = horizontals
+        self.edges[1::2, 1] = horizontals + k
+        self.stale = True
+        self.dirty = True
+        self.index_dirty = True
+
     def move_grid(self, offset):
-        for i in range(len(self.grid)):
-            self.grid[i] = (self.grid[i][0] + offset[0], self.grid[i][1] + offset[1], self.grid[i][2] + offset[2])
-
-    def draw(self):
-        glBegin(GL_LINES)
-        for edge in self.edges:
-            for vertex in edge:
-                glVertex3fv(self.grid[vertex])
-                vert = edge[0]
-                glColor3f(0.75 - (vert + 1) / (self.grid_sq ** 2) * 0.5, \
-                        0.25 + (vert + 1) / (self.grid_sq ** 2) * 0.25, \
-                        0.25 + (vert + 1) / (self.grid_sq ** 2 * 0.5))
-        glEnd()
\ No newline at end of file
+        if not self.grid.flags.writeable:
+            # vertices backed by a read-only chunk store mapping: take a private copy on the first change
+            self.grid = self.grid.copy()
+        self.grid += np.asarray(offset, dtype=np.float32)
+        self.stale = True
+        self.dirty = True
+
+    def build_vertex_data(self):
+        # interleaved position + color per vertex, with the color ramp running along the vertex index
+        t = np.arange(1, self.grid.shape[0] + 1, dtype=np.float32) / (self.grid_sq ** 2)
+        data = np.empty((self.grid.shape[0], 6), dtype=np.float32)
+        data[:, :3] = self.grid
+        data[:, 3] = 0.75 - t * 0.5
+        data[:, 4] = 0.25 + t * 0.25
+        data[:, 5] = 0.25 + t * 2
+        return data
+
+    def prepare(self):
+        # build the cpu-side vertex data without touching GL, safe to call off the render thread
+        if self.stale:
+            self.vertex_data = self.build_vertex_data()
+            self.stale = False
+
+    def upload(self):
+        self.prepare()
+        # fall back to client-side vertex arrays when buffer objects are unavailable
+        if bool(glGenBuffers):
+            if self.vbo is None:
+                self.vbo, self.ibo = glGenBuffers(2)
+                self.index_dirty = True
+            glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
+            glBufferData(GL_ARRAY_BUFFER, self.vertex_data.nbytes, self.vertex_data, GL_STATIC_DRAW)
+            glBindBuffer(GL_ARRAY_BUFFER, 0)
+            if self.index_dirty:
+                glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, self.ibo)
+                glBufferData(GL_ELEMENT_ARRAY_BUFFER, self.edges.nbytes, self.edges, GL_STATIC_DRAW)
+                glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, 0)
+                self.uploaded_count = self.edges.size
+        self.index_dirty = False
+        self.dirty = False
+
+    def release(self):
+        if self.uploader is not None:
+            self.uploader.cancel(self)
+        if self.vbo is not None:
+            if self.uploader is not None:
+                self.uploader.forget((self.vbo, self.ibo))
+            glDeleteBuffers(2, [self.vbo, self.ibo])
+            self.vbo = None
+            self.ibo = None
+            self.uploaded_count = 0
+        self.uploader = None
+        self.dirty = True
+
+    def bind(self, uploader=None):
+        # returns False when there is nothing to draw yet
+        if self.dirty:
+            if uploader is None:
+                self.upload()
+            else:
+                # streamed: keep drawing the previous contents until the ring gets to this grid
+                self.uploader = uploader
+                uploader.request(self)
+                if self.vbo is None:
+                    return False
+
+        glEnableClientState(GL_VERTEX_ARRAY)
+        glEnableClientState(GL_COLOR_ARRAY)
+        if self.vbo is not None:
+            glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
+            glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, self.ibo)
+            glVertexPointer(3, GL_FLOAT, VERTEX_STRIDE, ctypes.c_void_p(0))
+            glColorPointer(3, GL_FLOAT, VERTEX_STRIDE, ctypes.c_void_p(COLOR_OFFSET))
+        else:
+            address = self.vertex_data.ctypes.data
+            glVertexPointer(3, GL_FLOAT, VERTEX_STRIDE, ctypes.c_void_p(address))
+            glColorPointer(3, GL_FLOAT, VERTEX_STRIDE, ctypes.c_void_p(address + COLOR_OFFSET))
+        return True
+
+    def unbind(self):
+        if self.vbo is not None:
+            glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, 0)
+            glBindBuffer(GL_ARRAY_BUFFER, 0)
+        glDisableClientState(GL_COLOR_ARRAY)
+        glDisableClientState(GL_VERTEX_ARRAY)
+
+    def indices(self):
+        # offset into the bound index buffer, or the client-side index array
+        return ctypes.c_void_p(0) if self.ibo is not None else self.edges.ctypes.data_as(ctypes.c_void_p)
+
+    def bounds(self):
+        # axis-aligned (min, max) corners of the lattice in world coordinates
+        bounds = np.stack([self.grid.min(axis=0), self.grid.max(axis=0)]).astype(np.float64)
+        return bounds if self.origin is None else bounds + self.origin
+
+    @property
+    def index_count(self):
+        return self.edges.size
+
+    @property
+    def draw_count(self):
+        # indices to draw from what is bound: the index buffer's uploaded count, or the client-side array
+        return self.uploaded_count if self.ibo is not None else self.edges.size
+
+    def draw(self, uploader=None):
+        if not self.bind(uploader):
+            return
+        glDrawElements(GL_LINES, self.draw_count, GL_UNSIGNED_INT, self.indices())
+        self.unbind()
+
+
+INSTANCE_VERTEX_SHADER = """
+#version 120
+attribute vec3 offset;
+void main() {
+    gl_FrontColor = gl_Color;
+    gl_Position = gl_ModelViewProjectionMatrix * (gl_Vertex + vec4(offset, 0.0));
+}
+"""
+
+INSTANCE_FRAGMENT_SHADER = """
+#version 120
+void main() {
+    gl_FragColor = gl_Color;
+}
+"""
+
+
+class InstancedGrid:
+    def __init__(self, grid, offsets):
+        # one shared lattice drawn once per (x, y, z) offset
+        self.grid = grid
+        self.offsets = np.ascontiguousarray(offsets, dtype=np.float32).reshape(-1, 3)
+        self.program = None
+        self.offset_location = -1
+        self.offset_vbo = None
+        self.instancing = None
+
+    def set_offsets(self, offsets):
+        self.offsets = np.ascontiguousarray(offsets, dtype=np.float32).reshape(-1, 3)
+        if self.offset_vbo is not None:
+            self.upload_offsets()
+
+    def bounds(self):
+        box = self.grid.bounds()
+        return np.stack([box[0] + self.offsets.min(axis=0), box[1] + self.offsets.max(axis=0)])
+
+    def setup_instancing(self):
+        # hardware instancing needs shaders, instanced draws and attribute divisors, otherwise push a matrix per instance
+        self.instancing = False
+        if not (bool(glDrawElementsInstanced) and bool(glVertexAttribDivisor) and bool(glGenBuffers)):
+            return
+        try:
+            self.program = shaders.compileProgram(
+                shaders.compileShader(INSTANCE_VERTEX_SHADER, GL_VERTEX_SHADER),
+                shaders.compileShader(INSTANCE_FRAGMENT_SHADER, GL_FRAGMENT_SHADER))
+        except (RuntimeError, GLError):
+            self.program = None
+            return
+        self.offset_location = glGetAttribLocation(self.program, "offset")
+        self.offset_vbo = glGenBuffers(1)
+        self.upload_offsets()
+        self.instancing = True
+
+    def upload_offsets(self):
+        glBindBuffer(GL_ARRAY_BUFFER, self.offset_vbo)
+        glBufferData(GL_ARRAY_BUFFER, self.offsets.nbytes, self.offsets, GL_STATIC_DRAW)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+
+    def release(self):
+        if self.offset_vbo is not None:
+            glDeleteBuffers(1, [self.offset_vbo])
+            self.offset_vbo = None
+        if self.program is not None:
+            glDeleteProgram(self.program)
+            self.program = None
+        self.instancing = None
+        self.grid.release()
+
+    def draw(self, uploader=None):
+        if self.instancing is None:
+            self.setup_instancing()
+
+        if not self.grid.bind(uploader):
+            return
+        if self.instancing:
+            glUseProgram(self.program)
+            glBindBuffer(GL_ARRAY_BUFFER, self.offset_vbo)
+            glEnableVertexAttribArray(self.offset_location)
+            glVertexAttribPointer(self.offset_location, 3, GL_FLOAT, GL_FALSE, 0, ctypes.c_void_p(0))
+            glVertexAttribDivisor(self.offset_location, 1)
+            glDrawElementsInstanced(GL_LINES, self.grid.draw_count, GL_UNSIGNED_INT, self.grid.indices(),
+                                    self.offsets.shape[0])
+            glVertexAttribDivisor(self.offset_location, 0)
+            glDisableVertexAttribArray(self.offset_location)
+            glBindBuffer(GL_ARRAY_BUFFER, 0)
+            glUseProgram(0)
+        else:
+            for offset in self.offsets:
+                glPushMatrix()
+                glTranslatef(*offset)
+                glDrawElements(GL_LINES, self.grid.draw_count, GL_UNSIGNED_INT, self.grid.indices())
+                glPopMatrix()
+        self.grid.unbind()
+
+
+PROCEDURAL_VERTEX_SHADER = """
+#version 120
+varying vec3 world;
+void main() {
+    world = gl_Vertex.xyz;
+    gl_Position = gl_ModelViewProjectionMatrix * gl_Vertex;
+}
+"""
+
+PROCEDURAL_FRAGMENT_SHADER = """
+#version 120
+uniform vec3 eye;
+uniform float spacing;
+uniform float grid_sq;
+uniform float map_size;
+uniform float fade_start;
+uniform float fade_end;
+varying vec3 world;
+void main() {
+    // position inside the cell's lattice, in lines from its first corner
+    vec2 local = world.xz - floor(world.xz / map_size + 0.5) * map_size;
+    vec2 lattice = local / spacing + floor(grid_sq / 2.0);
+    if (any(lessThan(lattice, vec2(-0.5))) || any(greaterThan(lattice, vec2(grid_sq + 0.5)))) discard;
+
+    // screen-space line coverage, one pixel wide at any distance
+    vec2 coord = world.xz / spacing;
+    vec2 edge = abs(fract(coord - 0.5) - 0.5) / fwidth(coord);
+    float alpha = 1.0 - min(min(edge.x, edge.y), 1.0);
+    alpha *= 1.0 - smoothstep(fade_start, fade_end, distance(eye.xz, world.xz));
+    if (alpha < 0.01) discard;
+
+    // the same color ramp the geometry grid runs along its vertex index
+    float t = (lattice.y * (grid_sq + 1.0) + lattice.x + 1.0) / (grid_sq * grid_sq);
+    gl_FragColor = vec4(0.75 - t * 0.5, 0.25 + t * 0.25, 0.25 + t * 2.0, alpha);
+}
+"""
+
+
+class ProceduralGrid:
+    def __init__(self, map_size, grid_sq=10, spacing=1, layers=(0,), extent=100, fade=0.6):
+        # ground planes at y = layer * map_size that follow the eye, the fragment shader draws the lines
+        self.map_size = map_size
+        self.grid_sq = grid_sq
+        self.spacing = spacing
+        self.layers = np.asarray(layers, dtype=np.float32) * map_size
+        self.extent = extent
+        self.fade = fade
+        self.program = None
+        self.uniforms = {}
+        corners = np.array([[-1, -1], [1, -1], [1, 1], [-1, -1], [1, 1], [-1, 1]], dtype=np.float32) * extent
+        self.quads = np.zeros((len(self.layers), 6, 3), dtype=np.float32)
+        self.quads[:, :, 0] = corners[:, 0]
+        self.quads[:, :, 1] = self.layers[:, None]
+        self.quads[:, :, 2] = corners[:, 1]
+        self.vertices = np.empty_like(self.quads)
+
+    def setup(self):
+        self.program = shaders.compileProgram(
+            shaders.compileShader(PROCEDURAL_VERTEX_SHADER, GL_VERTEX_SHADER),
+            shaders.compileShader(PROCEDURAL_FRAGMENT_SHADER, GL_FRAGMENT_SHADER))
+        self.uniforms = {name: glGetUniformLocation(self.program, name)
+                         for name in ("eye", "spacing", "grid_sq", "map_size", "fade_start", "fade_end")}
+
+    def release(self):
+        if self.program is not None:
+            glDeleteProgram(self.program)
+            self.program = None
+
+    def draw(self, eye):
+        if self.program is None:
+            self.setup()
+        eye = np.asarray(eye, dtype=np.float32)
+        # keep the planes centered under the eye, snapped to the lattice so lines don't swim
+        snap = self.map_size
+        self.vertices[:] = self.quads
+        self.vertices[:, :, 0] += np.floor(eye[0] / snap) * snap
+        self.vertices[:, :, 2] += np.floor(eye[2] / snap) * snap
+
+        glUseProgram(self.program)
+        glUniform3f(self.uniforms["eye"], *eye)
+        glUniform1f(self.uniforms["spacing"], self.spacing)
+        glUniform1f(self.uniforms["grid_sq"], self.grid_sq)
+        glUniform1f(self.uniforms["map_size"], self.map_size)
+        glUniform1f(self.uniforms["fade_start"], self.extent * self.fade)
+        glUniform1f(self.uniforms["fade_end"], self.extent)
+        blend = glIsEnabled(GL_BLEND)
+        # the planes are seen from above and below, neither side may be culled
+        cull = glIsEnabled(GL_CULL_FACE)
+        glDisable(GL_CULL_FACE)
+        glEnable(GL_BLEND)
+        glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
+        glEnableClientState(GL_VERTEX_ARRAY)
+        glVertexPointer(3, GL_FLOAT, 0, self.vertices)
+        glDrawArrays(GL_TRIANGLES, 0, self.vertices.shape[0] * 6)
+        glDisableClientState(GL_VERTEX_ARRAY)
+        if not blend:
+            glDisable(GL_BLEND)
+        if cull:
+            glEnable(GL_CULL_FACE)
+        glUseProgram(0)
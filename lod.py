@@ -0,0 +1,71 @@
+import numpy as np
+from grid import Grid
+
+
+def lod_factors(grid_sq, levels):
+    # halve the density per level while the lattice still divides evenly
+    factors = [1]
+    while len(factors) < levels and grid_sq % (factors[-1] * 2) == 0:
+        factors.append(factors[-1] * 2)
+    return factors
+
+
+class LodGrid:
+    def __init__(self, grid_sq=10, levels=3, spacing=1, hysteresis=0.1):
+        # level 0 is full density, every following level halves it over the same extent
+        self.levels = [Grid(grid_sq // f, spacing * f) for f in lod_factors(grid_sq, levels)]
+        self.grid_sq = grid_sq
+        self.spacing = spacing
+        self.extent = grid_sq * spacing
+        self.hysteresis = hysteresis
+        self.level = 0
+        # world position the levels are relative to, None when they are in absolute world coordinates
+        self.origin = None
+        self.center = self.levels[0].bounds().mean(axis=0)
+
+    @property
+    def current(self):
+        return self.levels[self.level]
+
+    def move_grid(self, offset):
+        for grid in self.levels:
+            grid.move_grid(offset)
+        self.center = self.center + np.asarray(offset, dtype=np.float64)
+
+    def prepare(self):
+        for grid in self.levels:
+            grid.prepare()
+
+    def release(self):
+        for grid in self.levels:
+            grid.release()
+
+    def bounds(self):
+        bounds = self.levels[0].bounds()
+        return bounds if self.origin is None else bounds + self.origin
+
+    def threshold(self, level, bias):
+        # distance where level starts: one grid extent for level 1, doubling per level after that
+        return self.extent * bias * 2 ** (level - 1)
+
+    def select_level(self, eye, bias=1.0):
+        center = self.center if self.origin is None else self.center + self.origin
+        distance = np.linalg.norm(center - eye)
+        level = self.level
+        # step coarser only past the threshold plus the hysteresis band, finer only below it minus the band
+        while level + 1 < len(self.levels) and distance > self.threshold(level + 1, bias) * (1 + self.hysteresis):
+            level += 1
+        while level > 0 and distance < self.threshold(level, bias) * (1 - self.hysteresis):
+            level -= 1
+        self.level = level
+        return level
+
+    @property
+    def index_count(self):
+        return self.current.index_count
+
+    def draw_item(self, origin=None):
+        return self.current, None
+
+    def draw(self, uploader=None):
+        self.current.draw(uploader)
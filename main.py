@@ -1,39 +1,38 @@
 import pygame
-from OpenGL.GL import glTranslatef, glClear, GL_COLOR_BUFFER_BIT, GL_DEPTH_BUFFER_BIT, glLoadIdentity
 from world import World
 from grid import Grid
 from engine import Engine
+from controls import Controls
 
    
 def main():
     map_size = 10
-    engine = Engine(map_size)
+    # adapt detail to hold 60 fps on whatever machine this runs on
+    engine = Engine(map_size, frame_budget=1 / 60)
     screen_size = engine.screen_size
-    screen_width, screen_height = screen_size
-    glTranslatef(0.0,0.0, -40)
+    controls = Controls()
 
     while True:
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT or (event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE):
-                pygame.quit()
-                quit()
-            elif event.type == pygame.MOUSEMOTION:
-                x, y = event.pos
-                # update the pitch and yaw of the camera based on the mouse movement
-                engine.update_camera_direction(x, y)
-                # reset the mouse location and update the previous mouse position
-                pygame.mouse.set_pos(screen_width / 2, screen_height / 2)
-                engine.prev_mouse_pos = pygame.mouse.get_pos()
-                
+        t = engine.profiler.start()
+        # drain the event queue once and apply the frame's summed mouse motion as one turn
+        controls.poll()
+        if controls.quit:
+            if engine.recorder is not None:
+                engine.toggle_recording()
+            engine.dump_profile()
+            pygame.quit()
+            quit()
+        if pygame.K_F3 in controls.pressed:
+            engine.toggle_overlay()
+        if pygame.K_F5 in controls.pressed:
+            engine.toggle_recording()
+        engine.turn(*controls.mouse_delta)
+        engine.profiler.lap("events", t)
 
         engine.camera.set_projection(*screen_size)
-        glClear(GL_COLOR_BUFFER_BIT|GL_DEPTH_BUFFER_BIT)
-        glLoadIdentity()
-        
-        engine.camera.set()
         engine.update()
         
 
 if __name__ == "__main__":
     main()
-    pygame.quit()
\ No newline at end of file
+    pygame.quit()
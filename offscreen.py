@@ -0,0 +1,64 @@
+import ctypes
+import os
+
+
+def configure():
+    # must run before anything imports OpenGL, PyOpenGL binds its platform on first import
+    os.environ.setdefault("PYOPENGL_PLATFORM", "egl")
+    os.environ.setdefault("EGL_PLATFORM", "surfaceless")
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+
+def create_context(width=800, height=600):
+    # make an offscreen GL context current, EGL (Mesa surfaceless/llvmpipe) or OSMesa depending on PYOPENGL_PLATFORM
+    platform = os.environ.get("PYOPENGL_PLATFORM")
+    if platform == "egl":
+        return create_egl_context(width, height)
+    if platform == "osmesa":
+        return create_osmesa_context(width, height)
+    raise RuntimeError(f"no headless GL context for PYOPENGL_PLATFORM={platform!r}, use egl or osmesa")
+
+
+def create_egl_context(width, height):
+    from OpenGL import EGL
+
+    display = EGL.eglGetDisplay(EGL.EGL_DEFAULT_DISPLAY)
+    major, minor = EGL.EGLint(), EGL.EGLint()
+    if not EGL.eglInitialize(display, ctypes.pointer(major), ctypes.pointer(minor)):
+        raise RuntimeError("eglInitialize failed")
+    attributes = (EGL.EGLint * 13)(
+        EGL.EGL_SURFACE_TYPE, EGL.EGL_PBUFFER_BIT,
+        EGL.EGL_RED_SIZE, 8, EGL.EGL_GREEN_SIZE, 8, EGL.EGL_BLUE_SIZE, 8,
+        EGL.EGL_DEPTH_SIZE, 24,
+        EGL.EGL_RENDERABLE_TYPE, EGL.EGL_OPENGL_BIT,
+        EGL.EGL_NONE)
+    config = EGL.EGLConfig()
+    count = EGL.EGLint()
+    if not EGL.eglChooseConfig(display, attributes, ctypes.pointer(config), 1, ctypes.pointer(count)) or count.value == 0:
+        raise RuntimeError("no EGL config with desktop OpenGL and a pbuffer surface")
+    surface = EGL.eglCreatePbufferSurface(display, config, (EGL.EGLint * 5)(
+        EGL.EGL_WIDTH, width, EGL.EGL_HEIGHT, height, EGL.EGL_NONE))
+    EGL.eglBindAPI(EGL.EGL_OPENGL_API)
+    context = EGL.eglCreateContext(display, config, EGL.EGL_NO_CONTEXT, None)
+    if not EGL.eglMakeCurrent(display, surface, surface, context):
+        raise RuntimeError("eglMakeCurrent failed")
+    return (display, surface, context)
+
+
+def create_osmesa_context(width, height):
+    from OpenGL import GL, arrays, osmesa
+
+    context = osmesa.OSMesaCreateContextExt(osmesa.OSMESA_RGBA, 24, 0, 0, None)
+    if not context:
+        raise RuntimeError("OSMesaCreateContextExt failed")
+    buffer = arrays.GLubyteArray.zeros((height, width, 4))
+    if not osmesa.OSMesaMakeCurrent(context, buffer, GL.GL_UNSIGNED_BYTE, width, height):
+        raise RuntimeError("OSMesaMakeCurrent failed")
+    return (context, buffer)
+
+
+def renderer():
+    from OpenGL.GL import glGetString, GL_RENDERER, GL_VERSION
+
+    return f"{glGetString(GL_RENDERER).decode()} / {glGetString(GL_VERSION).decode()}"
@@ -0,0 +1,81 @@
+import queue
+import threading
+from profiler import FrameProfiler
+
+
+class FrameSnapshot:
+    __slots__ = ('view_gl', 'eye', 'items', 'releases', 'prepare_time')
+
+    def __init__(self, view_gl, eye, items, releases, prepare_time=0.0):
+        # everything the GL thread needs for one frame, never changed after it is made, positions in render space
+        self.view_gl = view_gl
+        self.eye = eye
+        self.items = tuple(items)
+        # objects dropped while preparing the frame, their GL buffers are freed on the GL thread
+        self.releases = tuple(releases)
+        # seconds the cpu side of the frame took, for the quality controller
+        self.prepare_time = prepare_time
+
+
+class Pipeline:
+    def __init__(self, engine, buffers=2):
+        # the simulation thread runs up to buffers - 1 frames ahead of the one being submitted
+        self.engine = engine
+        self.ready = queue.Queue(maxsize=max(buffers - 1, 1))
+        # the simulation thread's stages are timed apart from the GL thread's
+        self.profiler = FrameProfiler(enabled=engine.profiler.enabled)
+        self.thread = None
+        self.running = False
+        self.error = None
+        self.dropped = None
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self.run, name="simulation", daemon=True)
+        self.thread.start()
+
+    def run(self):
+        engine = self.engine
+        try:
+            while self.running:
+                alpha = engine.advance(self.profiler)
+                snapshot = engine.prepare_frame(alpha, self.profiler)
+                self.profiler.end_frame()
+                while True:
+                    if not self.running:
+                        self.dropped = snapshot
+                        break
+                    try:
+                        self.ready.put(snapshot, timeout=0.1)
+                        break
+                    except queue.Full:
+                        pass
+        except Exception as e:
+            self.error = e
+            self.running = False
+
+    def next(self):
+        # the oldest prepared frame, waiting for the simulation thread if none is ready
+        if self.thread is None:
+            self.start()
+        while True:
+            if self.error is not None:
+                raise RuntimeError("simulation thread failed") from self.error
+            try:
+                return self.ready.get(timeout=0.1)
+            except queue.Empty:
+                pass
+
+    def stop(self):
+        self.running = False
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+        # frames that will never be drawn still carry objects to free
+        snapshots = [self.dropped] if self.dropped is not None else []
+        self.dropped = None
+        while not self.ready.empty():
+            snapshots.append(self.ready.get_nowait())
+        for snapshot in snapshots:
+            for obj in snapshot.releases:
+                obj.release()
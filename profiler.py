@@ -0,0 +1,147 @@
+import json
+import time
+import numpy as np
+import pygame
+from OpenGL.GL import glWindowPos2i, glDrawPixels, glIsEnabled, glDisable, glEnable, \
+    GL_RGBA, GL_UNSIGNED_BYTE, GL_DEPTH_TEST
+
+STAGES = ("events", "navigate", "look", "move", "set", "render", "flip", "total")
+
+
+class FrameProfiler:
+    def __init__(self, enabled=False, capacity=600, stages=STAGES):
+        # one ring buffer row per frame, one column per stage, NaN where a stage didn't run;
+        # the extra row is the frame in progress, so a full ring still holds capacity completed frames
+        self.enabled = enabled
+        self.stages = tuple(stages)
+        self.columns = {stage: i for i, stage in enumerate(self.stages)}
+        self.samples = np.full((capacity + 1, len(self.stages)), np.nan)
+        self.capacity = capacity
+        self.index = 0
+        self.count = 0
+        self.frame = 0
+        self.frame_start = None
+
+    def start(self):
+        if not self.enabled:
+            return 0.0
+        return time.perf_counter()
+
+    def lap(self, stage, start):
+        # record the time since start against stage and return the start of the next stage
+        if not self.enabled:
+            return 0.0
+        now = time.perf_counter()
+        # stages that run several times a frame (simulation ticks) accumulate
+        column = self.columns[stage]
+        previous = self.samples[self.index, column]
+        self.samples[self.index, column] = now - start if previous != previous else previous + now - start
+        if self.frame_start is None:
+            self.frame_start = start
+        return now
+
+    def end_frame(self):
+        if not self.enabled:
+            return
+        if self.frame_start is not None:
+            self.samples[self.index, self.columns["total"]] = time.perf_counter() - self.frame_start
+        self.frame_start = None
+        self.frame += 1
+        self.count = min(self.count + 1, self.capacity)
+        self.index = (self.index + 1) % len(self.samples)
+        self.samples[self.index] = np.nan
+
+    def reset(self):
+        self.samples[:] = np.nan
+        self.index = 0
+        self.count = 0
+        self.frame_start = None
+
+    def recent(self):
+        # completed frames, oldest first
+        if self.count < self.capacity:
+            return self.samples[self.index - self.count:self.index]
+        return np.roll(self.samples, -self.index - 1, axis=0)[:-1]
+
+    def summary(self):
+        # per-stage milliseconds over the buffered frames
+        samples = self.recent() * 1e3
+        summary = {}
+        for stage, i in self.columns.items():
+            column = samples[:, i]
+            column = column[~np.isnan(column)]
+            if column.size == 0:
+                continue
+            p50, p95, p99 = np.percentile(column, (50, 95, 99))
+            summary[stage] = dict(p50=float(p50), p95=float(p95), p99=float(p99),
+                                  mean=float(column.mean()), count=int(column.size))
+        return summary
+
+    def dump(self, path):
+        # append every buffered frame as one JSON line of per-stage milliseconds
+        samples = self.recent() * 1e3
+        first = self.frame - samples.shape[0]
+        with open(path, "a") as f:
+            for n, row in enumerate(samples):
+                record = {"frame": first + n}
+                record.update({stage: float(row[i]) for stage, i in self.columns.items() if not np.isnan(row[i])})
+                f.write(json.dumps(record) + "\n")
+
+
+class ProfilerOverlay:
+    def __init__(self, profiler, quality=None, uploader=None, refresh=0.5, font_size=16):
+        # text is re-rendered at most every refresh seconds, drawing in between reuses the cached pixels
+        self.profiler = profiler
+        self.quality = quality
+        self.uploader = uploader
+        self.refresh = refresh
+        self.font_size = font_size
+        self.font = None
+        self.pixels = None
+        self.size = (0, 0)
+        self.updated = 0.0
+
+    def lines(self):
+        summary = self.profiler.summary()
+        lines = [f"{'stage':<9}{'p50':>8}{'p95':>8}{'p99':>8}  ms"]
+        for stage in self.profiler.stages:
+            if stage in summary:
+                s = summary[stage]
+                lines.append(f"{stage:<9}{s['p50']:>8.2f}{s['p95']:>8.2f}{s['p99']:>8.2f}")
+        if self.quality is not None:
+            m = self.quality.metrics()
+            smoothed = "-" if m["smoothed_ms"] is None else f"{m['smoothed_ms']:.2f}"
+            lines.append(f"quality {m['level']}  {smoothed}/{m['budget_ms']:.2f} ms  scale {m['resolution_scale']:.2f}"
+                         f"  bias {m['lod_bias']:.2f}  radius {m['view_radius']}")
+        if self.uploader is not None:
+            u = self.uploader.stats()
+            lines.append(f"upload {u['bytes'] / 1024:.0f} KiB  {u['uploads']} grids  {u['fence_waits']} waits"
+                         f"  {u['pending']} queued")
+        return lines
+
+    def update(self):
+        if self.font is None:
+            pygame.font.init()
+            self.font = pygame.font.SysFont("monospace", self.font_size)
+        rendered = [self.font.render(line, True, (255, 255, 255), (0, 0, 0)) for line in self.lines()]
+        width = max(surface.get_width() for surface in rendered)
+        height = sum(surface.get_height() for surface in rendered)
+        surface = pygame.Surface((width, height))
+        y = 0
+        for line in rendered:
+            surface.blit(line, (0, y))
+            y += line.get_height()
+        # flipped rows because GL rasterizes bottom-up
+        self.pixels = pygame.image.tostring(surface, "RGBA", True)
+        self.size = (width, height)
+        self.updated = time.perf_counter()
+
+    def draw(self, screen_height):
+        if self.pixels is None or time.perf_counter() - self.updated > self.refresh:
+            self.update()
+        depth = glIsEnabled(GL_DEPTH_TEST)
+        glDisable(GL_DEPTH_TEST)
+        glWindowPos2i(0, screen_height - self.size[1])
+        glDrawPixels(self.size[0], self.size[1], GL_RGBA, GL_UNSIGNED_BYTE, self.pixels)
+        if depth:
+            glEnable(GL_DEPTH_TEST)
@@ -0,0 +1,148 @@
+from collections import deque
+from OpenGL.GL import glGenFramebuffers, glDeleteFramebuffers, glBindFramebuffer, glGenRenderbuffers, \
+    glDeleteRenderbuffers, glBindRenderbuffer, glRenderbufferStorage, glFramebufferRenderbuffer, glBlitFramebuffer, \
+    glGetIntegerv, glViewport, GL_FRAMEBUFFER, GL_READ_FRAMEBUFFER, GL_DRAW_FRAMEBUFFER, GL_RENDERBUFFER, \
+    GL_RGBA8, GL_DEPTH_COMPONENT24, GL_COLOR_ATTACHMENT0, GL_DEPTH_ATTACHMENT, GL_DRAW_FRAMEBUFFER_BINDING, \
+    GL_COLOR_BUFFER_BIT, GL_LINEAR
+
+
+def quality_levels(view_radius=1, lod_bias=1.0, lod=True, streamed=True):
+    # cheapest visual losses first: coarser detail, then fewer pixels, then fewer loaded chunks;
+    # knobs that change nothing here (no LOD levels, a fixed map) are left off so every step pays off
+    steps = [("lod_bias", lod_bias / 2), ("resolution_scale", 0.75), ("lod_bias", lod_bias / 4),
+             ("resolution_scale", 0.5)]
+    steps += [("view_radius", radius) for radius in range(view_radius - 1, -1, -1)]
+    live = dict(lod_bias=lod, resolution_scale=True, view_radius=streamed)
+    levels = [dict(lod_bias=lod_bias, resolution_scale=1.0, view_radius=view_radius)]
+    for knob, value in steps:
+        if live[knob]:
+            levels.append(dict(levels[-1], **{knob: value}))
+    return levels
+
+
+class QualityController:
+    def __init__(self, budget=1 / 60, levels=None, smoothing=0.1, band=0.1, headroom=0.7, patience=20,
+                 cooldown=60, history=64):
+        # level 0 is full quality, each following level is cheaper
+        self.budget = budget
+        self.levels = levels or quality_levels()
+        self.level = 0
+        # exponential moving average of frame times
+        self.smoothing = smoothing
+        self.smoothed = None
+        # drop a level past budget * (1 + band), climb back only under budget * headroom, held for a while
+        self.band = band
+        self.headroom = headroom
+        self.patience = patience
+        self.over = 0
+        self.under = 0
+        # frames to ignore after a change while the new level settles
+        self.cooldown = cooldown
+        self.wait = 0
+        self.frame = 0
+        self.changes = 0
+        self.decisions = deque(maxlen=history)
+
+    @property
+    def settings(self):
+        return self.levels[self.level]
+
+    def update(self, frame_time):
+        # feed one frame time in seconds, returns the new settings when the level changes
+        self.frame += 1
+        self.smoothed = frame_time if self.smoothed is None else \
+            self.smoothed + self.smoothing * (frame_time - self.smoothed)
+        if self.wait:
+            self.wait -= 1
+            return None
+
+        if self.smoothed > self.budget * (1 + self.band):
+            self.over += 1
+            self.under = 0
+        elif self.smoothed < self.budget * self.headroom:
+            self.under += 1
+            self.over = 0
+        else:
+            self.over = self.under = 0
+
+        # climbing back is slower than backing off, a level that was too slow shouldn't be retried at once
+        if self.over >= self.patience and self.level + 1 < len(self.levels):
+            return self.set_level(self.level + 1, "over budget")
+        if self.under >= 4 * self.patience and self.level > 0:
+            return self.set_level(self.level - 1, "under budget")
+        return None
+
+    def set_level(self, level, reason):
+        self.decisions.append(dict(frame=self.frame, level=level, previous=self.level, reason=reason,
+                                   smoothed_ms=self.smoothed * 1e3))
+        self.level = level
+        self.changes += 1
+        self.over = self.under = 0
+        self.wait = self.cooldown
+        return self.settings
+
+    def metrics(self):
+        return dict(level=self.level, budget_ms=self.budget * 1e3,
+                    smoothed_ms=None if self.smoothed is None else self.smoothed * 1e3,
+                    changes=self.changes, **self.settings)
+
+
+class ResolutionScaler:
+    def __init__(self, width, height, scale=1.0):
+        # below full scale the scene renders into a smaller framebuffer that is stretched over the screen
+        self.width = width
+        self.height = height
+        self.scale = scale
+        self.fbo = None
+        self.renderbuffers = None
+        self.size = None
+        self.target = 0
+        self.active = False
+
+    @property
+    def scaled_size(self):
+        return max(1, int(self.width * self.scale)), max(1, int(self.height * self.scale))
+
+    def allocate(self, size):
+        self.release()
+        self.fbo = int(glGenFramebuffers(1))
+        self.renderbuffers = [int(rb) for rb in glGenRenderbuffers(2)]
+        glBindFramebuffer(GL_FRAMEBUFFER, self.fbo)
+        for renderbuffer, storage, attachment in zip(self.renderbuffers, (GL_RGBA8, GL_DEPTH_COMPONENT24),
+                                                     (GL_COLOR_ATTACHMENT0, GL_DEPTH_ATTACHMENT)):
+            glBindRenderbuffer(GL_RENDERBUFFER, renderbuffer)
+            glRenderbufferStorage(GL_RENDERBUFFER, storage, *size)
+            glFramebufferRenderbuffer(GL_FRAMEBUFFER, attachment, GL_RENDERBUFFER, renderbuffer)
+        glBindRenderbuffer(GL_RENDERBUFFER, 0)
+        glBindFramebuffer(GL_FRAMEBUFFER, self.target)
+        self.size = size
+
+    def begin(self):
+        if self.scale >= 1:
+            return
+        size = self.scaled_size
+        self.target = int(glGetIntegerv(GL_DRAW_FRAMEBUFFER_BINDING))
+        if size != self.size:
+            self.allocate(size)
+        glBindFramebuffer(GL_FRAMEBUFFER, self.fbo)
+        glViewport(0, 0, *size)
+        self.active = True
+
+    def end(self):
+        # stretch the scaled frame over the full framebuffer
+        if not self.active:
+            return
+        glBindFramebuffer(GL_READ_FRAMEBUFFER, self.fbo)
+        glBindFramebuffer(GL_DRAW_FRAMEBUFFER, self.target)
+        glBlitFramebuffer(0, 0, *self.size, 0, 0, self.width, self.height, GL_COLOR_BUFFER_BIT, GL_LINEAR)
+        glBindFramebuffer(GL_FRAMEBUFFER, self.target)
+        glViewport(0, 0, self.width, self.height)
+        self.active = False
+
+    def release(self):
+        if self.fbo is not None:
+            glDeleteFramebuffers(1, [self.fbo])
+            glDeleteRenderbuffers(2, self.renderbuffers)
+            self.fbo = None
+            self.renderbuffers = None
+            self.size = None
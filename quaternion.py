@@ -1,3 +1,4 @@
+import math
 import numpy as np
 from typing import List, Tuple
 
@@ -5,6 +6,8 @@ class Quaternion:
     """
     A class representing a quaternion.
     """
+    __slots__ = ('x', 'y', 'z', 'w')
+
     def __init__(self, axis=[0.0, 0.0, 0.0], angle=0.0) -> None:
         """
         Creates a quaternion from an axis and an angle.
@@ -13,11 +16,33 @@ class Quaternion:
         axis (List[float]): The axis of rotation.
         angle (float): The angle of rotation in radians.
         """
-        self.w = np.cos(angle/2)
-        self.x = axis[0] * np.sin(angle/2)
-        self.y = axis[1] * np.sin(angle/2)
-        self.z = axis[2] * np.sin(angle/2)
-        
+        s = math.sin(angle/2)
+        self.w = math.cos(angle/2)
+        self.x = float(axis[0]) * s
+        self.y = float(axis[1]) * s
+        self.z = float(axis[2]) * s
+
+    @classmethod
+    def from_components(cls, x, y, z, w) -> 'Quaternion':
+        """
+        Creates a quaternion directly from its components, without any trig.
+
+        Parameters:
+        x (float): The x component.
+        y (float): The y component.
+        z (float): The z component.
+        w (float): The w component.
+
+        Returns:
+        Quaternion: The quaternion with the given components.
+        """
+        q = cls.__new__(cls)
+        q.x = float(x)
+        q.y = float(y)
+        q.z = float(z)
+        q.w = float(w)
+        return q
+
     def __getitem__(self, b):
         """
         Returns the value of the quaternion at the given index.
@@ -37,7 +62,7 @@ class Quaternion:
             if b == slice(None):
                 return [self.x, self.y, self.z, self.w]
             else:
-                [self.x, self.y, self.z, self.w][b.start:b.stop:b.step]
+                return [self.x, self.y, self.z, self.w][b.start:b.stop:b.step]
         elif isinstance(b, tuple):
             if len(b) == 2:
                 if isinstance(b[0], int) and isinstance(b[1], int):
@@ -47,7 +72,7 @@ class Quaternion:
             else:
                 raise IndexError("Quaternion slice must be [:]")
         else:
-            return self.__dict__[b] if b in self.__dict__ else None
+            return getattr(self, b, None) if isinstance(b, str) else None
     
     def __repr__(self):
         return f"Quaternion({self.x}, {self.y}, {self.z}, {self.w})"
@@ -62,17 +87,18 @@ class Quaternion:
         Returns:
         Quaternion: The product of the two quaternions.
         """
-        if isinstance(other, float) or isinstance(other, int):
-            x = self.x * other
-            y = self.y * other
-            z = self.z * other
-            w = self.w * other
-        else:
-            w = self.w*other.w - self.x*other.x - self.y*other.y - self.z*other.z
-            x = self.w*other.x + self.x*other.w + self.y*other.z - self.z*other.y
-            y = self.w*other.y - self.x*other.z + self.y*other.w + self.z*other.x
-            z = self.w*other.z + self.x*other.y - self.y*other.x + self.z*other.w
-        return Quaternion([x, y, z], w)
+        if isinstance(other, (float, int, np.floating, np.integer)):
+            return Quaternion.from_components(self.x * other, self.y * other, self.z * other, self.w * other)
+        if not isinstance(other, Quaternion):
+            return NotImplemented
+        ax, ay, az, aw = self.x, self.y, self.z, self.w
+        bx, by, bz, bw = other.x, other.y, other.z, other.w
+        q = Quaternion.__new__(Quaternion)
+        q.w = aw*bw - ax*bx - ay*by - az*bz
+        q.x = aw*bx + ax*bw + ay*bz - az*by
+        q.y = aw*by - ax*bz + ay*bw + az*bx
+        q.z = aw*bz + ax*by - ay*bx + az*bw
+        return q
     
     def __add__(self, other: 'Quaternion') -> 'Quaternion':
         """
@@ -84,7 +110,7 @@ class Quaternion:
         Returns:
         Quaternion: The sum of the two quaternions.
         """
-        return Quaternion([self.x+other.x, self.y+other.y, self.z+other.z], self.w+other.w)
+        return Quaternion.from_components(self.x+other.x, self.y+other.y, self.z+other.z, self.w+other.w)
     
     # += operator
     def __iadd__(self, other: 'Quaternion') -> 'Quaternion':
@@ -114,7 +140,7 @@ class Quaternion:
         Returns:
         Quaternion: The quotient of the quaternion and the scalar.
         """
-        return Quaternion([self.x/other, self.y/other, self.z/other], self.w/other)
+        return Quaternion.from_components(self.x/other, self.y/other, self.z/other, self.w/other)
     
     def norm(self) -> float:
         """
@@ -123,7 +149,7 @@ class Quaternion:
         Returns:
         Quaternion: The norm of the quaternion.
         """
-        return np.sqrt(self.w**2 + self.x**2 + self.y**2 + self.z**2)
+        return math.sqrt(self.w*self.w + self.x*self.x + self.y*self.y + self.z*self.z)
     
     def rotate(self, v: List[float]) -> List[float]:
         """
@@ -188,7 +214,7 @@ class Quaternion:
         x = (matrix[2, 1] - matrix[1, 2])/(4*w)
         y = (matrix[0, 2] - matrix[2, 0])/(4*w)
         z = (matrix[1, 0] - matrix[0, 1])/(4*w)
-        return cls([x, y, z], w)
+        return cls.from_components(x, y, z, w)
     
     def to_euler(self) -> List[float]:
         """
@@ -220,7 +246,7 @@ class Quaternion:
         x = np.sin(phi/2)*np.cos(theta/2)*np.cos(psi/2) - np.cos(phi/2)*np.sin(theta/2)*np.sin(psi/2)
         y = np.cos(phi/2)*np.sin(theta/2)*np.cos(psi/2) + np.sin(phi/2)*np.cos(theta/2)*np.sin(psi/2)
         z = np.cos(phi/2)*np.cos(theta/2)*np.sin(psi/2) - np.sin(phi/2)*np.sin(theta/2)*np.cos(psi/2)
-        return cls([x, y, z], w)
+        return cls.from_components(x, y, z, w)
     
     def to_axis_angle(self) -> Tuple[List[float], float]:
         """
@@ -251,7 +277,7 @@ class Quaternion:
         x = axis[0]*np.sin(angle/2)
         y = axis[1]*np.sin(angle/2)
         z = axis[2]*np.sin(angle/2)
-        return cls([x, y, z], w)
+        return cls.from_components(x, y, z, w)
     
     def to_rotation_vector(self) -> List[float]:
         """
@@ -312,7 +338,7 @@ class Quaternion:
         Returns:
         Quaternion: The conjugate.
         """
-        return Quaternion([-self.x, -self.y, -self.z], self.w)
+        return Quaternion.from_components(-self.x, -self.y, -self.z, self.w)
     
     def inverse(self) -> 'Quaternion':
         """
@@ -323,6 +349,47 @@ class Quaternion:
         """
         return self.conjugate()/self.norm()**2
     
+    def dot(self, other: 'Quaternion') -> float:
+        """
+        Returns the dot product of two quaternions.
+
+        Parameters:
+        other (Quaternion): The other quaternion.
+
+        Returns:
+        float: The dot product.
+        """
+        return self.x*other.x + self.y*other.y + self.z*other.z + self.w*other.w
+
+    def slerp(self, other: 'Quaternion', t: float) -> 'Quaternion':
+        """
+        Spherically interpolates between two unit quaternions along the shortest arc.
+
+        Parameters:
+        other (Quaternion): The quaternion at t = 1.
+        t (float): The interpolation parameter between 0 and 1.
+
+        Returns:
+        Quaternion: The interpolated unit quaternion.
+        """
+        d = self.dot(other)
+        # q and -q are the same rotation, take the short way around
+        sign = 1.0
+        if d < 0:
+            d = -d
+            sign = -1.0
+        if d > 0.9995:
+            # nearly parallel, a normalized lerp is accurate and avoids dividing by sin(~0)
+            a, b = 1 - t, t * sign
+        else:
+            theta = math.acos(d)
+            s = math.sin(theta)
+            a = math.sin((1 - t) * theta) / s
+            b = math.sin(t * theta) / s * sign
+        q = Quaternion.from_components(a*self.x + b*other.x, a*self.y + b*other.y,
+                                       a*self.z + b*other.z, a*self.w + b*other.w)
+        return q / q.norm()
+
     def to_np_array(self) -> np.array:
         """
         Returns the quaternion as a 64-byte np.array
@@ -339,4 +406,297 @@ class Quaternion:
         Returns:
         64-byte np.array: The normalized quaternion.
         """
-        return self.to_np_array()/self.norm()
\ No newline at end of file
+        return self.to_np_array()/self.norm()
+
+class QuaternionArray:
+    """
+    A class representing a batch of quaternions stored as a contiguous (N, 4) array
+    of (x, y, z, w) components, matching the component order of Quaternion.
+    """
+    def __init__(self, data=None) -> None:
+        """
+        Creates a quaternion array from an (N, 4) array of (x, y, z, w) components.
+
+        Parameters:
+        data (np.array): The quaternion components. Defaults to a single identity quaternion.
+        """
+        if data is None:
+            data = [[0.0, 0.0, 0.0, 1.0]]
+        data = np.ascontiguousarray(data, dtype=np.float64)
+        if data.ndim == 1:
+            data = data.reshape(1, 4)
+        if data.ndim != 2 or data.shape[1] != 4:
+            raise ValueError("QuaternionArray data must have shape (N, 4)")
+        self.data = data
+
+    @property
+    def x(self) -> np.array:
+        return self.data[:, 0]
+
+    @property
+    def y(self) -> np.array:
+        return self.data[:, 1]
+
+    @property
+    def z(self) -> np.array:
+        return self.data[:, 2]
+
+    @property
+    def w(self) -> np.array:
+        return self.data[:, 3]
+
+    def __len__(self) -> int:
+        return self.data.shape[0]
+
+    def __getitem__(self, b):
+        """
+        Returns a single Quaternion for an integer index, or a QuaternionArray otherwise.
+        """
+        if isinstance(b, (int, np.integer)):
+            x, y, z, w = self.data[b]
+            return Quaternion.from_components(x, y, z, w)
+        return QuaternionArray(self.data[b])
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def __repr__(self):
+        return f"QuaternionArray({self.data!r})"
+
+    @classmethod
+    def identity(cls, n: int) -> 'QuaternionArray':
+        """
+        Creates an array of n identity quaternions.
+
+        Parameters:
+        n (int): The number of quaternions.
+
+        Returns:
+        QuaternionArray: The identity quaternions.
+        """
+        data = np.zeros((n, 4), dtype=np.float64)
+        data[:, 3] = 1.0
+        return cls(data)
+
+    @classmethod
+    def from_quaternions(cls, quaternions) -> 'QuaternionArray':
+        """
+        Creates a quaternion array from a sequence of Quaternion objects.
+
+        Parameters:
+        quaternions (List[Quaternion]): The quaternions.
+
+        Returns:
+        QuaternionArray: The packed quaternions.
+        """
+        return cls(np.array([[q.x, q.y, q.z, q.w] for q in quaternions], dtype=np.float64).reshape(-1, 4))
+
+    def to_quaternions(self) -> List[Quaternion]:
+        """
+        Returns the quaternion array as a list of Quaternion objects.
+
+        Returns:
+        List[Quaternion]: The unpacked quaternions.
+        """
+        return list(self)
+
+    def __mul__(self, other) -> 'QuaternionArray':
+        """
+        Multiplies quaternions element-wise (Hamilton product), broadcasting a single
+        quaternion against many.
+
+        Parameters:
+        other (QuaternionArray, Quaternion or float): The quaternion(s) or scalar to multiply by.
+
+        Returns:
+        QuaternionArray: The products.
+        """
+        if isinstance(other, (float, int, np.floating, np.integer)):
+            return QuaternionArray(self.data * other)
+        if isinstance(other, Quaternion):
+            other = QuaternionArray([other.x, other.y, other.z, other.w])
+        x1, y1, z1, w1 = self.data.T
+        x2, y2, z2, w2 = other.data.T
+        out = np.empty((max(len(self), len(other)), 4), dtype=np.float64)
+        out[:, 3] = w1*w2 - x1*x2 - y1*y2 - z1*z2
+        out[:, 0] = w1*x2 + x1*w2 + y1*z2 - z1*y2
+        out[:, 1] = w1*y2 - x1*z2 + y1*w2 + z1*x2
+        out[:, 2] = w1*z2 + x1*y2 - y1*x2 + z1*w2
+        return QuaternionArray(out)
+
+    def __rmul__(self, other) -> 'QuaternionArray':
+        if isinstance(other, Quaternion):
+            return QuaternionArray([other.x, other.y, other.z, other.w]) * self
+        return self * other
+
+    def norm(self) -> np.array:
+        """
+        Returns the norm of each quaternion.
+
+        Returns:
+        np.array: The (N,) norms.
+        """
+        return np.sqrt(np.einsum('ij,ij->i', self.data, self.data))
+
+    def normalize(self) -> 'QuaternionArray':
+        """
+        Returns the unit quaternions corresponding to the quaternions.
+
+        Returns:
+        QuaternionArray: The unit quaternions.
+        """
+        return QuaternionArray(self.data / self.norm()[:, None])
+
+    def conjugate(self) -> 'QuaternionArray':
+        """
+        Returns the conjugate of each quaternion.
+
+        Returns:
+        QuaternionArray: The conjugates.
+        """
+        out = self.data.copy()
+        out[:, :3] *= -1
+        return QuaternionArray(out)
+
+    def inverse(self) -> 'QuaternionArray':
+        """
+        Returns the inverse of each quaternion.
+
+        Returns:
+        QuaternionArray: The inverses.
+        """
+        conjugate = self.conjugate()
+        conjugate.data /= np.einsum('ij,ij->i', self.data, self.data)[:, None]
+        return conjugate
+
+    def rotate(self, v) -> np.array:
+        """
+        Rotates an (M, 3) array of vectors. A single quaternion rotates every vector,
+        otherwise quaternions and vectors are paired element-wise.
+
+        Parameters:
+        v (np.array): The vectors to rotate.
+
+        Returns:
+        np.array: The (M, 3) rotated vectors.
+        """
+        v = np.asarray(v, dtype=np.float64)
+        qv = self.data[:, :3]
+        w = self.data[:, 3:]
+        uv = np.cross(qv, v)
+        uuv = np.cross(qv, uv)
+        return v + 2*(w*uv + uuv)
+
+    def to_matrix(self) -> np.array:
+        """
+        Returns the rotation matrices corresponding to the quaternions.
+
+        Returns:
+        np.array: The (N, 3, 3) rotation matrices.
+        """
+        x, y, z, w = self.data.T
+        matrix = np.empty((len(self), 3, 3), dtype=np.float64)
+        matrix[:, 0, 0] = 1 - 2*y**2 - 2*z**2
+        matrix[:, 0, 1] = 2*x*y - 2*z*w
+        matrix[:, 0, 2] = 2*x*z + 2*y*w
+        matrix[:, 1, 0] = 2*x*y + 2*z*w
+        matrix[:, 1, 1] = 1 - 2*x**2 - 2*z**2
+        matrix[:, 1, 2] = 2*y*z - 2*x*w
+        matrix[:, 2, 0] = 2*x*z - 2*y*w
+        matrix[:, 2, 1] = 2*y*z + 2*x*w
+        matrix[:, 2, 2] = 1 - 2*x**2 - 2*y**2
+        return matrix
+
+    @classmethod
+    def from_matrix(cls, matrix) -> 'QuaternionArray':
+        """
+        Creates quaternions from an (N, 3, 3) array of rotation matrices. Each matrix
+        takes the branch of its largest diagonal term, so 180 degree rotations are stable.
+
+        Parameters:
+        matrix (np.array): The rotation matrices.
+
+        Returns:
+        QuaternionArray: The quaternions corresponding to the rotation matrices.
+        """
+        m = np.asarray(matrix, dtype=np.float64).reshape(-1, 3, 3)
+        m00, m11, m22 = m[:, 0, 0], m[:, 1, 1], m[:, 2, 2]
+        trace = m00 + m11 + m22
+        branch = np.argmax(np.stack([trace, m00, m11, m22], axis=1), axis=1)
+        out = np.empty((m.shape[0], 4), dtype=np.float64)
+
+        i = branch == 0
+        s = np.sqrt(1 + trace[i]) * 2
+        out[i] = np.stack([(m[i, 2, 1] - m[i, 1, 2])/s, (m[i, 0, 2] - m[i, 2, 0])/s,
+                           (m[i, 1, 0] - m[i, 0, 1])/s, s/4], axis=1)
+        i = branch == 1
+        s = np.sqrt(1 + m00[i] - m11[i] - m22[i]) * 2
+        out[i] = np.stack([s/4, (m[i, 0, 1] + m[i, 1, 0])/s,
+                           (m[i, 0, 2] + m[i, 2, 0])/s, (m[i, 2, 1] - m[i, 1, 2])/s], axis=1)
+        i = branch == 2
+        s = np.sqrt(1 + m11[i] - m00[i] - m22[i]) * 2
+        out[i] = np.stack([(m[i, 0, 1] + m[i, 1, 0])/s, s/4,
+                           (m[i, 1, 2] + m[i, 2, 1])/s, (m[i, 0, 2] - m[i, 2, 0])/s], axis=1)
+        i = branch == 3
+        s = np.sqrt(1 + m22[i] - m00[i] - m11[i]) * 2
+        out[i] = np.stack([(m[i, 0, 2] + m[i, 2, 0])/s, (m[i, 1, 2] + m[i, 2, 1])/s,
+                           s/4, (m[i, 1, 0] - m[i, 0, 1])/s], axis=1)
+        return cls(out)
+
+    @classmethod
+    def from_axis_angle(cls, axis, angle) -> 'QuaternionArray':
+        """
+        Creates quaternions from (N, 3) axes and (N,) angles. Either may be a single value
+        that is broadcast against the other.
+
+        Parameters:
+        axis (np.array): The axes.
+        angle (np.array): The angles in radians.
+
+        Returns:
+        QuaternionArray: The quaternions corresponding to the axes and angles.
+        """
+        axis = np.atleast_2d(np.asarray(axis, dtype=np.float64))
+        angle = np.atleast_1d(np.asarray(angle, dtype=np.float64))
+        axis = axis / np.linalg.norm(axis, axis=1, keepdims=True)
+        half = angle / 2
+        n = max(axis.shape[0], half.shape[0])
+        out = np.empty((n, 4), dtype=np.float64)
+        out[:, :3] = axis * np.sin(half)[:, None]
+        out[:, 3] = np.cos(half)
+        return cls(out)
+
+    @classmethod
+    def from_euler_angles(cls, phi, theta, psi) -> 'QuaternionArray':
+        """
+        Creates quaternions from arrays of euler angles, using the same convention as
+        Quaternion.from_euler_angles.
+
+        Parameters:
+        phi (np.array): The first euler angles.
+        theta (np.array): The second euler angles.
+        psi (np.array): The third euler angles.
+
+        Returns:
+        QuaternionArray: The quaternions corresponding to the euler angles.
+        """
+        phi, theta, psi = np.broadcast_arrays(*(np.atleast_1d(np.asarray(a, dtype=np.float64)) for a in (phi, theta, psi)))
+        cp, sp = np.cos(phi/2), np.sin(phi/2)
+        ct, st = np.cos(theta/2), np.sin(theta/2)
+        cs, ss = np.cos(psi/2), np.sin(psi/2)
+        out = np.empty((phi.shape[0], 4), dtype=np.float64)
+        out[:, 3] = cp*ct*cs + sp*st*ss
+        out[:, 0] = sp*ct*cs - cp*st*ss
+        out[:, 1] = cp*st*cs + sp*ct*ss
+        out[:, 2] = cp*ct*ss - sp*st*cs
+        return cls(out)
+
+    def to_np_array(self) -> np.array:
+        """
+        Returns the vector parts of the quaternions as an (N, 3) 64-byte np.array
+
+        Returns:
+        64-byte np.array: The vector parts.
+        """
+        return self.data[:, :3].copy()
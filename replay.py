@@ -0,0 +1,140 @@
+import argparse
+import struct
+import sys
+import time
+import numpy as np
+from quaternion import QuaternionArray
+
+# file layout: header, then one float32 (x, y, z, qx, qy, qz, qw) record per simulation tick
+MAGIC = b"EPTH"
+VERSION = 1
+HEADER = struct.Struct("<4sHxxfI")
+RECORD_FIELDS = 7
+
+
+class CameraPath:
+    def __init__(self, positions, rotations, tick_rate):
+        self.positions = np.ascontiguousarray(positions, dtype=np.float64).reshape(-1, 3)
+        self.rotations = rotations if isinstance(rotations, QuaternionArray) else QuaternionArray(rotations)
+        self.tick_rate = tick_rate
+
+    def __len__(self):
+        return self.positions.shape[0]
+
+    @property
+    def duration(self):
+        return max(len(self) - 1, 0) / self.tick_rate
+
+    def save(self, path):
+        records = np.empty((len(self), RECORD_FIELDS), dtype=np.float32)
+        records[:, :3] = self.positions
+        records[:, 3:] = self.rotations.data
+        with open(path, "wb") as f:
+            f.write(HEADER.pack(MAGIC, VERSION, self.tick_rate, len(self)))
+            f.write(records.tobytes())
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as f:
+            magic, version, tick_rate, count = HEADER.unpack(f.read(HEADER.size))
+            if magic != MAGIC or version != VERSION:
+                raise ValueError(f"{path} is not a version {VERSION} camera path")
+            records = np.fromfile(f, dtype=np.float32, count=count * RECORD_FIELDS).reshape(count, RECORD_FIELDS)
+        return cls(records[:, :3], records[:, 3:].astype(np.float64), tick_rate)
+
+    def sample(self, t):
+        # (pos, rotation) at time t, lerped and slerped between the surrounding ticks
+        s = min(max(t * self.tick_rate, 0.0), len(self) - 1)
+        i = min(int(s), len(self) - 2) if len(self) > 1 else 0
+        alpha = s - i
+        if len(self) == 1:
+            return self.positions[0], self.rotations[0]
+        pos = self.positions[i] + (self.positions[i + 1] - self.positions[i]) * alpha
+        return pos, self.rotations[i].slerp(self.rotations[i + 1], alpha)
+
+
+class PathRecorder:
+    def __init__(self, tick_rate):
+        self.tick_rate = tick_rate
+        self.records = []
+
+    def capture(self, camera):
+        q = camera.rotation_quaternion
+        self.records.append((*camera.pos, q.x, q.y, q.z, q.w))
+
+    def path(self):
+        records = np.array(self.records, dtype=np.float64).reshape(-1, RECORD_FIELDS)
+        return CameraPath(records[:, :3], records[:, 3:], self.tick_rate)
+
+    def save(self, path):
+        self.path().save(path)
+
+
+def standard_flight_path(seconds=20.0, tick_rate=60, map_size=10):
+    # a fixed, repeatable flight: a rising spiral through the map while yawing, pitching and rolling
+    t = np.arange(int(seconds * tick_rate) + 1) / tick_rate
+    radius = map_size * 0.4
+    positions = np.stack([radius * np.cos(t * 0.5), map_size * 0.3 * np.sin(t * 0.2), radius * np.sin(t * 0.5)], axis=1)
+    yaw = -t * 0.5
+    pitch = 0.3 * np.sin(t * 0.7)
+    roll = 0.2 * np.sin(t * 0.3)
+    rotations = QuaternionArray.from_axis_angle([0, 1, 0], yaw) * QuaternionArray.from_axis_angle([1, 0, 0], pitch) \
+        * QuaternionArray.from_axis_angle([0, 0, 1], roll)
+    return CameraPath(positions, rotations, tick_rate)
+
+
+def play_frame(engine, path, t):
+    # put the camera on the path at time t and render one frame
+    pos, rotation = path.sample(t)
+    engine.camera.pos = pos
+    engine.camera.rotation_quaternion = rotation
+    engine.previous_pos = engine.camera.pos
+    engine.previous_rotation = engine.camera.rotation_quaternion
+    engine.render()
+
+
+def replay(engine, path, fps=60):
+    # play the whole path at a fixed virtual frame rate and return per-frame seconds
+    from OpenGL.GL import glFinish
+
+    frames = int(path.duration * fps) + 1
+    times = np.empty(frames)
+    for n in range(frames):
+        start = time.perf_counter()
+        play_frame(engine, path, n / fps)
+        glFinish()
+        times[n] = time.perf_counter() - start
+    return times
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay a recorded camera path headlessly and report frame times.")
+    parser.add_argument("path", nargs="?", help="recorded .path file, the standard flight path if omitted")
+    parser.add_argument("--fps", type=float, default=60, help="virtual playback frame rate")
+    parser.add_argument("--size", type=int, nargs=2, default=(1280, 720), metavar=("WIDTH", "HEIGHT"))
+    parser.add_argument("--map-size", type=int, default=10)
+    parser.add_argument("-o", "--output", help="write the frame time summary as JSON to this path")
+    parser.add_argument("--capture", metavar="DIR", help="stream every rendered frame to this directory")
+    parser.add_argument("--format", choices=("png", "raw"), default="png", help="captured frame format")
+    args = parser.parse_args(argv)
+
+    import offscreen
+    offscreen.configure()
+    from benchmarks import runner
+    from engine import Engine
+
+    engine = Engine(args.map_size, offscreen=True, screen_size=tuple(args.size),
+                    capture_dir=args.capture, capture_format=args.format)
+    path = CameraPath.load(args.path) if args.path else standard_flight_path(map_size=args.map_size)
+    times = replay(engine, path, args.fps)
+    engine.close()
+    summary = runner.summarize(times, 1)
+    print(f"{summary['samples']} frames  p50 {summary['p50']/1e3:.3f} ms  p95 {summary['p95']/1e3:.3f} ms  "
+          f"p99 {summary['p99']/1e3:.3f} ms  max {summary['max']/1e3:.3f} ms")
+    if args.output:
+        runner.save(args.output, runner.report({"replay": summary}, {"gl": offscreen.renderer()}))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
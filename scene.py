@@ -0,0 +1,156 @@
+import numpy as np
+from OpenGL.GL import glPushMatrix, glPopMatrix, glMultMatrixf
+from quaternion import Quaternion, QuaternionArray
+
+
+class SceneNode:
+    def __init__(self, obj=None, translation=(0, 0, 0), rotation=None):
+        # local transform relative to the parent, the world matrix is cached until something above changes
+        self.obj = obj
+        self.translation = np.array(translation, dtype=np.float64)
+        self.rotation = rotation if rotation is not None else Quaternion()
+        self.parent = None
+        self.children = []
+        self.depth = 0
+        self.graph = None
+        self.world = np.identity(4)
+        # column-major float32 draw matrix, the world matrix moved onto the object's origin
+        self.world_gl = np.identity(4, dtype=np.float32)
+        self.local_bounds = obj.bounds() if obj is not None and hasattr(obj, 'bounds') else None
+        self.dirty = False
+
+    def add_child(self, node):
+        if node.parent is not None:
+            node.parent.remove_child(node)
+        node.parent = self
+        self.children.append(node)
+        node.attach(self.graph, self.depth + 1)
+        return node
+
+    def remove_child(self, node):
+        self.children.remove(node)
+        node.parent = None
+        node.attach(None, 0)
+
+    def attach(self, graph, depth):
+        # move the subtree into a graph, it needs its world matrices rebuilt there
+        self.graph = graph
+        self.depth = depth
+        self.dirty = False
+        self.mark_dirty()
+        for child in self.children:
+            child.attach(graph, depth + 1)
+
+    def mark_dirty(self):
+        # a dirty node's whole subtree is dirty, so an already dirty node needs no walk
+        if self.dirty:
+            return
+        self.dirty = True
+        if self.graph is not None:
+            self.graph.dirty.append(self)
+        for child in self.children:
+            child.mark_dirty()
+
+    def set_translation(self, translation):
+        self.translation = np.array(translation, dtype=np.float64)
+        self.mark_dirty()
+
+    def set_rotation(self, rotation):
+        self.rotation = rotation
+        self.mark_dirty()
+
+    def offset(self):
+        # the attached object's own origin in the node's frame, its vertices are relative to it
+        origin = getattr(self.obj, 'origin', None)
+        return np.zeros(3) if origin is None else np.asarray(origin, dtype=np.float64)
+
+    def refresh_bounds(self):
+        # call after the attached object's geometry changes
+        self.local_bounds = self.obj.bounds()
+
+    def bounds(self):
+        # world axis-aligned box around the transformed corners of the object's local box
+        lo, hi = self.local_bounds
+        corners = np.array([[x, y, z] for x in (lo[0], hi[0]) for y in (lo[1], hi[1]) for z in (lo[2], hi[2])])
+        corners = corners @ self.world[:3, :3].T + self.world[:3, 3]
+        return np.stack([corners.min(axis=0), corners.max(axis=0)])
+
+    def select_level(self, eye, bias=1.0):
+        # level of detail is picked from the eye in the object's local frame
+        if not hasattr(self.obj, 'select_level'):
+            return None
+        rotation = self.world[:3, :3]
+        return self.obj.select_level(rotation.T @ (np.asarray(eye, dtype=np.float64) - self.world[:3, 3]), bias)
+
+    @property
+    def index_count(self):
+        return getattr(self.obj, 'index_count', 0)
+
+    def draw_item(self, origin=None):
+        # the cached matrix, or one rebased onto a floating render origin
+        obj = self.obj.draw_item()[0] if hasattr(self.obj, 'draw_item') else self.obj
+        if origin is None or not np.any(origin):
+            return obj, self.world_gl
+        world = self.world.copy()
+        world[:3, 3] += world[:3, :3] @ self.offset() - origin
+        return obj, np.ascontiguousarray(world.T, dtype=np.float32)
+
+    def draw(self, uploader=None):
+        glPushMatrix()
+        glMultMatrixf(self.world_gl)
+        if uploader is None:
+            self.obj.draw()
+        else:
+            self.obj.draw(uploader)
+        glPopMatrix()
+
+    def release(self):
+        if self.obj is not None and hasattr(self.obj, 'release'):
+            self.obj.release()
+
+
+class SceneGraph:
+    def __init__(self):
+        self.root = SceneNode()
+        self.root.graph = self
+        self.dirty = []
+
+    def add(self, node, parent=None):
+        return (self.root if parent is None else parent).add_child(node)
+
+    def remove(self, node):
+        node.parent.remove_child(node)
+
+    def update(self):
+        # rebuild the world matrices of every dirty node, returns the nodes that changed
+        if not self.dirty:
+            return []
+        nodes = [node for node in self.dirty if node.dirty and node.graph is self]
+        self.dirty = []
+        # every queued node may have left the graph since it was marked
+        if not nodes:
+            return []
+        nodes.sort(key=lambda node: node.depth)
+
+        # every local matrix in one vectorized quaternion to matrix conversion
+        local = np.tile(np.identity(4), (len(nodes), 1, 1))
+        rotations = QuaternionArray([[n.rotation.x, n.rotation.y, n.rotation.z, n.rotation.w] for n in nodes])
+        local[:, :3, :3] = rotations.to_matrix()
+        local[:, :3, 3] = [node.translation for node in nodes]
+
+        # parents come before children, so one batched multiply per depth finishes a whole level
+        depths = np.array([node.depth for node in nodes])
+        starts = np.flatnonzero(np.r_[True, depths[1:] != depths[:-1]])
+        for start, end in zip(starts, np.r_[starts[1:], len(nodes)]):
+            level = nodes[start:end]
+            parents = np.array([node.parent.world for node in level])
+            world = parents @ local[start:end]
+            # objects are drawn from their own origin, children only inherit the node's transform
+            draw = world.copy()
+            draw[:, :3, 3] += np.einsum('nij,nj->ni', world[:, :3, :3], [node.offset() for node in level])
+            world_gl = np.ascontiguousarray(draw.transpose(0, 2, 1), dtype=np.float32)
+            for i, node in enumerate(level):
+                node.world = world[i]
+                node.world_gl = world_gl[i]
+                node.dirty = False
+        return nodes
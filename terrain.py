@@ -0,0 +1,226 @@
+import os
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import numpy as np
+from grid import Grid
+from culling import ray_box_spans
+
+# heightfield samples per vertex: height, then the unit normal
+SAMPLE_FIELDS = 4
+# steps per lattice spacing when a ray is marched across a heightfield, and bisections refining the crossing
+# before a last linear interpolation
+RAY_STEPS = 4
+RAY_REFINE = 8
+# direction the baked line shading is lit from
+LIGHT = np.array([0.4, 0.8, 0.45]) / np.linalg.norm([0.4, 0.8, 0.45])
+
+
+def lattice_values(ix, iz, seed):
+    # integer lattice coordinates hashed to [0, 1), the same for a coordinate in every chunk and process
+    h = ix.astype(np.uint64) * np.uint64(0x9E3779B1) + iz.astype(np.uint64) * np.uint64(0x85EBCA77) \
+        + np.uint64(seed) * np.uint64(0xC2B2AE3D)
+    h &= np.uint64(0xFFFFFFFF)
+    h ^= h >> np.uint64(15)
+    h = (h * np.uint64(0x2C1B3C6D)) & np.uint64(0xFFFFFFFF)
+    h ^= h >> np.uint64(12)
+    h = (h * np.uint64(0x297A2D39)) & np.uint64(0xFFFFFFFF)
+    h ^= h >> np.uint64(15)
+    return h.astype(np.float64) / 2 ** 32
+
+
+def value_noise(x, z, seed=0):
+    # smoothly interpolated lattice values in [-1, 1]
+    x0 = np.floor(x)
+    z0 = np.floor(z)
+    fx = x - x0
+    fz = z - z0
+    ux = fx * fx * (3 - 2 * fx)
+    uz = fz * fz * (3 - 2 * fz)
+    ix = x0.astype(np.int64)
+    iz = z0.astype(np.int64)
+    a = lattice_values(ix, iz, seed)
+    b = lattice_values(ix + 1, iz, seed)
+    c = lattice_values(ix, iz + 1, seed)
+    d = lattice_values(ix + 1, iz + 1, seed)
+    top = a + (b - a) * ux
+    bottom = c + (d - c) * ux
+    return (top + (bottom - top) * uz) * 2 - 1
+
+
+def fbm(x, z, seed=0, octaves=5, lacunarity=2.0, gain=0.5):
+    # octaves of value noise, each finer and fainter than the last, normalized back to [-1, 1]
+    total = np.zeros(np.broadcast(x, z).shape)
+    amplitude = 1.0
+    frequency = 1.0
+    norm = 0.0
+    for octave in range(octaves):
+        total += amplitude * value_noise(x * frequency, z * frequency, seed + octave)
+        norm += amplitude
+        amplitude *= gain
+        frequency *= lacunarity
+    return total / norm
+
+
+def heightfield(cell, grid_sq=10, spacing=1, map_size=10, seed=0, height=2.0, scale=8.0, octaves=5):
+    # (k * k, 4) heights and normals of a chunk, sampled in world space so neighboring chunks meet seamlessly
+    n = grid_sq
+    k = n + 1
+    # one extra sample around the edge for central differences
+    ticks = (np.arange(-1, k + 1) * spacing - (n * spacing) // 2).astype(np.float64)
+    x, z = np.meshgrid(ticks + cell[0] * map_size, ticks + cell[2] * map_size)
+    h = height * fbm(x / scale, z / scale, seed, octaves)
+
+    samples = np.empty((k, k, SAMPLE_FIELDS))
+    samples[..., 0] = h[1:-1, 1:-1]
+    normals = samples[..., 1:]
+    normals[..., 0] = -(h[1:-1, 2:] - h[1:-1, :-2]) / (2 * spacing)
+    normals[..., 1] = 1.0
+    normals[..., 2] = -(h[2:, 1:-1] - h[:-2, 1:-1]) / (2 * spacing)
+    normals /= np.linalg.norm(normals, axis=-1, keepdims=True)
+    return samples.reshape(k * k, SAMPLE_FIELDS)
+
+
+def generate_into(name, cell, params):
+    # worker side: write the chunk's samples straight into the caller's shared block
+    block = shared_memory.SharedMemory(name=name)
+    try:
+        k = params["grid_sq"] + 1
+        out = np.ndarray((k * k, SAMPLE_FIELDS), dtype=np.float32, buffer=block.buf)
+        out[:] = heightfield(cell, **params)
+    finally:
+        block.close()
+    return cell
+
+
+class TerrainGrid(Grid):
+    def __init__(self, grid_sq=10, spacing=1, samples=None):
+        # a grid lattice displaced by a heightfield, lines shaded by the surface normal
+        super().__init__(grid_sq, spacing)
+        k = grid_sq + 1
+        samples = np.zeros((k * k, SAMPLE_FIELDS), dtype=np.float32) if samples is None else samples
+        self.grid[:, 1] += samples[:, 0]
+        self.normals = np.ascontiguousarray(samples[:, 1:], dtype=np.float32)
+
+    def build_vertex_data(self):
+        data = super().build_vertex_data()
+        data[:, 3:] *= (0.35 + 0.65 * np.clip(self.normals @ LIGHT, 0, 1))[:, None]
+        return data
+
+    def height_at(self, x, z):
+        # bilinearly interpolated surface height at world (x, z), clamped to the chunk's edges
+        n = self.grid_sq
+        k = n + 1
+        heights = self.grid[:, 1].astype(np.float64).reshape(k, k)
+        corner = self.grid[0].astype(np.float64)
+        if self.origin is not None:
+            corner = corner + self.origin
+        u = np.clip((np.asarray(x, dtype=np.float64) - corner[0]) / self.spacing, 0, n)
+        v = np.clip((np.asarray(z, dtype=np.float64) - corner[2]) / self.spacing, 0, n)
+        # rows run along z and columns along x
+        i = np.minimum(np.floor(u), n - 1).astype(int)
+        j = np.minimum(np.floor(v), n - 1).astype(int)
+        fu = u - i
+        fv = v - j
+        near = heights[j, i] * (1 - fu) + heights[j, i + 1] * fu
+        far = heights[j + 1, i] * (1 - fu) + heights[j + 1, i + 1] * fu
+        height = near * (1 - fv) + far * fv
+        return height if self.origin is None else height + self.origin[1]
+
+    def clearance(self, origins, directions, t):
+        # (R, S) height of each ray over the surface at its (R, S) distances t
+        points = origins[:, None, :] + directions[:, None, :] * t[..., None]
+        return points[..., 1] - self.height_at(points[..., 0], points[..., 2])
+
+    def raycast(self, origins, directions, max_distance=np.inf):
+        # first crossing of each ray down through the surface: march the stretch inside the chunk's box,
+        # then bisect the step where the ray goes from above the surface to below it
+        origins = np.asarray(origins, dtype=np.float64).reshape(-1, 3)
+        directions = np.asarray(directions, dtype=np.float64).reshape(-1, 3)
+        near, far = (t[:, 0] for t in ray_box_spans(origins, directions, self.bounds()))
+        far = np.minimum(far, max_distance)
+        distance = np.full(origins.shape[0], np.inf)
+        struck = np.full(origins.shape[0], None, dtype=object)
+        rays = np.flatnonzero(np.isfinite(near) & (near <= far))
+        if rays.size == 0:
+            return distance, struck
+        origins = origins[rays]
+        directions = directions[rays]
+        near = near[rays]
+        far = far[rays]
+
+        # steps fine enough to land inside every lattice cell the ray passes over
+        across = (far - near) * np.linalg.norm(directions[:, [0, 2]], axis=1)
+        steps = int(np.ceil(across.max() / self.spacing * RAY_STEPS)) + 2
+        t = near[:, None] + (far - near)[:, None] * np.linspace(0, 1, steps)
+        height = self.clearance(origins, directions, t)
+        crossing = (height[:, :-1] >= 0) & (height[:, 1:] <= 0)
+        found = crossing.any(axis=1)
+        step = crossing.argmax(axis=1)[found]
+        rows = np.flatnonzero(found)
+        origins = origins[rows]
+        directions = directions[rows]
+        lo = t[rows, step]
+        hi = t[rows, step + 1]
+        lo_height = height[rows, step]
+        hi_height = height[rows, step + 1]
+        for _ in range(RAY_REFINE):
+            mid = (lo + hi) / 2
+            mid_height = self.clearance(origins, directions, mid[:, None])[:, 0]
+            over = mid_height > 0
+            lo = np.where(over, mid, lo)
+            lo_height = np.where(over, mid_height, lo_height)
+            hi = np.where(over, hi, mid)
+            hi_height = np.where(over, hi_height, mid_height)
+        # the surface is close to linear along such a short stretch
+        with np.errstate(divide='ignore', invalid='ignore'):
+            fraction = np.where(lo_height > hi_height, lo_height / (lo_height - hi_height), 1.0)
+        distance[rays[rows]] = lo + (hi - lo) * np.clip(fraction, 0, 1)
+        struck[rays[rows]] = self
+        return distance, struck
+
+
+class TerrainGenerator:
+    def __init__(self, seed=0, grid_sq=10, spacing=1, map_size=10, height=2.0, scale=8.0, octaves=5, workers=None):
+        # heights and normals are computed in worker processes and come back through shared memory
+        self.params = dict(grid_sq=grid_sq, spacing=spacing, map_size=map_size, seed=seed, height=height,
+                           scale=scale, octaves=octaves)
+        self.workers = workers or os.cpu_count() or 1
+        # workers start from a clean server process, never forked from this one while its threads hold locks
+        method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+        self.executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context(method))
+
+    @property
+    def sample_bytes(self):
+        return (self.params["grid_sq"] + 1) ** 2 * SAMPLE_FIELDS * 4
+
+    def submit(self, cell):
+        # returns (shared block, future), the future finishes once the block is filled
+        block = shared_memory.SharedMemory(create=True, size=self.sample_bytes)
+        return block, self.executor.submit(generate_into, block.name, tuple(cell), self.params)
+
+    def finish(self, cell, block, future):
+        try:
+            future.result()
+            k = self.params["grid_sq"] + 1
+            samples = np.ndarray((k * k, SAMPLE_FIELDS), dtype=np.float32, buffer=block.buf)
+            grid = TerrainGrid(self.params["grid_sq"], self.params["spacing"], samples)
+            del samples
+        finally:
+            block.close()
+            block.unlink()
+        grid.origin = np.array(cell, dtype=np.float64) * self.params["map_size"]
+        grid.prepare()
+        return grid
+
+    def build(self, cell, map_size=None):
+        # chunk builder: blocks the calling chunk thread, not the render thread
+        return self.finish(cell, *self.submit(cell))
+
+    def build_many(self, cells):
+        # every chunk in flight at once across all workers
+        pending = [(cell, *self.submit(cell)) for cell in cells]
+        return [self.finish(*entry) for entry in pending]
+
+    def close(self):
+        self.executor.shutdown(wait=True, cancel_futures=True)
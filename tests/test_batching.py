@@ -0,0 +1,24 @@
+from world import World
+from grid import Grid
+
+
+def test_remove_static_without_a_batch():
+    world = World(10)
+    world.remove_static(Grid(2))
+    assert world.batch is None
+
+
+def test_emptied_batch_is_dropped():
+    world = World(10)
+    a, b = Grid(2), Grid(2)
+    b.move_grid((10, 0, 0))
+    world.add_static(a)
+    world.add_static(b)
+    world.remove_static(a)
+    assert world.objects == [world.batch]
+    world.remove_static(b)
+    assert world.batch is None
+    assert world.objects == []
+    world.add_static(a)
+    assert world.objects == [world.batch]
+    assert a in world.batch
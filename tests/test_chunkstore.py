@@ -0,0 +1,50 @@
+import numpy as np
+from chunkstore import ChunkStore
+from grid import Grid
+from terrain import TerrainGrid, heightfield
+
+TERRAIN = dict(seed=3, height=3.0)
+
+
+def terrain_chunk(cell):
+    chunk = TerrainGrid(10, 1, heightfield(cell, **TERRAIN).astype(np.float32))
+    chunk.origin = np.array(cell, dtype=np.float64) * 10
+    chunk.prepare()
+    return chunk
+
+
+def test_terrain_chunks_load_as_terrain(tmp_path):
+    path = str(tmp_path / "chunks.bin")
+    built = terrain_chunk((1, 0, 0))
+    store = ChunkStore(path, terrain=TERRAIN)
+    store.put((1, 0, 0), built)
+    store.close()
+
+    store = ChunkStore(path, terrain=TERRAIN)
+    cached = store.get((1, 0, 0))
+    assert isinstance(cached, TerrainGrid)
+    np.testing.assert_array_equal(cached.normals, built.normals)
+    np.testing.assert_array_equal(cached.vertex_data, built.vertex_data)
+    origins = np.array([[12.3, 6, 0.7], [8.1, 6, -3.2]])
+    directions = np.array([[0, -1, 0], [0.6, -0.5, 0.3]])
+    np.testing.assert_allclose(cached.raycast(origins, directions)[0], built.raycast(origins, directions)[0])
+    store.close()
+
+
+def test_cached_chunks_copy_on_move(tmp_path):
+    path = str(tmp_path / "chunks.bin")
+    store = ChunkStore(path)
+    built = Grid()
+    built.prepare()
+    store.put((0, 0, 0), built)
+    store.close()
+
+    store = ChunkStore(path)
+    cached = store.get((0, 0, 0))
+    cached.move_grid((0, 1, 0))
+    cached.prepare()
+    np.testing.assert_array_equal(cached.vertex_data[:, 1], 1)
+    np.testing.assert_array_equal(cached.vertex_data[:, 3:], built.vertex_data[:, 3:])
+    # the file still holds the chunk as built
+    np.testing.assert_array_equal(store.get((0, 0, 0)).vertex_data, built.vertex_data)
+    store.close()
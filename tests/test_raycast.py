@@ -0,0 +1,92 @@
+import numpy as np
+from world import World
+from grid import Grid
+from terrain import TerrainGrid, heightfield
+
+
+def terrain_world(seed=3, height=3.0):
+    world = World(10)
+    for x in (-1, 0, 1):
+        for z in (-1, 0, 1):
+            chunk = TerrainGrid(10, 1, heightfield((x, 0, z), seed=seed, height=height).astype(np.float32))
+            chunk.origin = np.array([x, 0, z], dtype=np.float64) * 10
+            world.add_object(chunk)
+    return world
+
+
+def test_batched_ground_hits_members():
+    world = World(10, render_mode="batched")
+    world.construct_map()
+    hits = world.ground([[0.3, 5, 0.2], [5.5, 12, 0]])
+    np.testing.assert_allclose(hits.distance, [5, 2])
+    np.testing.assert_allclose(hits.points[:, 1], [0, 10])
+    assert all(type(obj) is Grid for obj in hits.objects)
+    # cells count from the member's corner, not the batch's
+    assert hits.cells.tolist() == [[5, 5], [0, 5]]
+
+
+def test_batched_matches_geometry():
+    batched = World(10, render_mode="batched")
+    batched.construct_map()
+    geometry = World(10)
+    geometry.construct_map()
+    rng = np.random.default_rng(1)
+    origins = rng.uniform(-14, 14, (300, 3))
+    directions = rng.normal(size=(300, 3))
+    a = batched.raycast(origins, directions)
+    b = geometry.raycast(origins, directions)
+    assert a.hit.any()
+    np.testing.assert_allclose(a.distance, b.distance)
+    np.testing.assert_array_equal(a.cells, b.cells)
+
+
+def test_batch_gaps_miss():
+    world = World(10)
+    for x in (0, 30):
+        grid = Grid()
+        grid.move_grid((x, 0, 0))
+        world.add_static(grid)
+    hits = world.ground([[15, 5, 0], [30, 5, 0]])
+    assert not hits.hit[0]
+    assert hits.distance[1] == 5
+
+
+def test_terrain_ground_samples_heightfield():
+    world = terrain_world()
+    positions = np.random.default_rng(2).uniform(-14, 14, (200, 3))
+    positions[:, 1] = 8
+    hits = world.ground(positions)
+    assert hits.hit.all()
+    expected = [obj.height_at(x, z) for obj, (x, _, z) in zip(hits.objects, positions)]
+    np.testing.assert_allclose(hits.points[:, 1], expected, atol=1e-9)
+    # on a lattice vertex the surface is the vertex height
+    chunk = hits.objects[0]
+    vertex = chunk.grid[37].astype(np.float64) + chunk.origin
+    hit = world.ground([[vertex[0], 8, vertex[2]]])
+    np.testing.assert_allclose(hit.points[0], vertex, atol=1e-6)
+
+
+def test_terrain_oblique_rays_hit_first_crossing():
+    world = terrain_world()
+    rng = np.random.default_rng(4)
+    origins = rng.uniform(-14, 14, (100, 3))
+    origins[:, 1] = 6
+    directions = rng.normal(size=(100, 3))
+    directions[:, 1] = -np.abs(directions[:, 1]) - 0.2
+    directions /= np.linalg.norm(directions, axis=1, keepdims=True)
+    hits = world.raycast(origins, directions)
+    assert hits.hit.sum() > 50
+    for origin, direction, distance, point, obj in zip(origins, directions, hits.distance, hits.points,
+                                                       hits.objects):
+        if obj is None:
+            continue
+        assert abs(point[1] - obj.height_at(point[0], point[2])) < 1e-6
+        # everything before the hit is above the surface of whichever chunk it passes over
+        t = np.linspace(0, distance, 400)[:-1]
+        before = origin + direction * t[:, None]
+        for chunk in world.objects:
+            lo, hi = chunk.bounds()
+            inside = np.all((before[:, [0, 2]] >= lo[[0, 2]]) & (before[:, [0, 2]] <= hi[[0, 2]]), axis=1)
+            if inside.any():
+                p = before[inside]
+                assert np.all(p[:, 1] - chunk.height_at(p[:, 0], p[:, 2]) > -1e-6)
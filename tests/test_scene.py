@@ -0,0 +1,23 @@
+import numpy as np
+from world import World
+from grid import Grid
+
+
+def test_moved_node_is_reindexed_when_another_is_added():
+    world = World(10)
+    a = world.add_node(Grid(4))
+    a.set_translation((50, 0, 0))
+    world.add_node(Grid(4))
+    np.testing.assert_allclose(world.index.entries[id(a)][1], [[48, 0, -2], [52, 0, 2]])
+    np.testing.assert_allclose(world.index.entries[id(a)][1], a.bounds())
+    world.sync_scene()
+    np.testing.assert_allclose(world.index.entries[id(a)][1], a.bounds())
+
+
+def test_detached_dirty_node_is_skipped():
+    world = World(10)
+    node = world.add_node(Grid())
+    node.set_translation((2, 0, 0))
+    world.remove_node(node)
+    world.sync_scene()
+    assert world.objects == []
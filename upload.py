@@ -0,0 +1,150 @@
+import ctypes
+import time
+from collections import OrderedDict
+import numpy as np
+from OpenGL.GL import glGenBuffers, glDeleteBuffers, glBindBuffer, glBufferData, glBufferSubData, glBufferStorage, \
+    glMapBufferRange, glUnmapBuffer, glCopyBufferSubData, glFenceSync, glClientWaitSync, glDeleteSync, \
+    GL_COPY_READ_BUFFER, GL_COPY_WRITE_BUFFER, GL_ARRAY_BUFFER, GL_ELEMENT_ARRAY_BUFFER, GL_STATIC_DRAW, \
+    GL_STREAM_DRAW, GL_MAP_WRITE_BIT, GL_MAP_PERSISTENT_BIT, GL_MAP_COHERENT_BIT, GL_SYNC_GPU_COMMANDS_COMPLETE, \
+    GL_SYNC_FLUSH_COMMANDS_BIT, GL_ALREADY_SIGNALED, GL_TIMEOUT_EXPIRED, GL_WAIT_FAILED
+
+# how long one glClientWaitSync call blocks before checking again, in nanoseconds
+WAIT_SLICE = 1000000
+
+
+class UploadRing:
+    def __init__(self, size=8 << 20, segments=3, budget=2 << 20):
+        # a persistently mapped staging buffer split into one segment per frame in flight;
+        # each frame's uploads are copied out of its segment on the GPU and fenced
+        self.size = size
+        self.segments = segments
+        self.segment_size = size // segments
+        # bytes streamed per frame at most, one oversized upload is still let through on an idle frame
+        self.budget = min(budget, self.segment_size)
+        self.queue = OrderedDict()
+        self.fences = [None] * segments
+        self.segment = 0
+        self.offset = 0
+        self.allocated = {}
+        self.staging = None
+        self.mapped = None
+        self.persistent = bool(glBufferStorage) and bool(glCopyBufferSubData)
+        if self.persistent:
+            self.staging = int(glGenBuffers(1))
+            flags = GL_MAP_WRITE_BIT | GL_MAP_PERSISTENT_BIT | GL_MAP_COHERENT_BIT
+            glBindBuffer(GL_COPY_READ_BUFFER, self.staging)
+            glBufferStorage(GL_COPY_READ_BUFFER, size, None, flags)
+            self.mapped = glMapBufferRange(GL_COPY_READ_BUFFER, 0, size, flags)
+            glBindBuffer(GL_COPY_READ_BUFFER, 0)
+        self.frame = dict(bytes=0, uploads=0, fence_waits=0, wait_ms=0.0)
+        self.totals = dict(self.frame)
+        self.frames = 0
+
+    def request(self, grid):
+        # queue a grid whose vertex data changed, it keeps drawing its previous contents meanwhile
+        self.queue[id(grid)] = grid
+
+    def cancel(self, grid):
+        self.queue.pop(id(grid), None)
+
+    @property
+    def pending(self):
+        return len(self.queue)
+
+    def begin_frame(self):
+        # reuse this frame's segment once the GPU has finished copying out of it
+        self.frame = dict(bytes=0, uploads=0, fence_waits=0, wait_ms=0.0)
+        fence = self.fences[self.segment]
+        if fence is not None:
+            start = time.perf_counter()
+            status = glClientWaitSync(fence, GL_SYNC_FLUSH_COMMANDS_BIT, 0)
+            if status != GL_ALREADY_SIGNALED:
+                self.frame["fence_waits"] += 1
+                while status == GL_TIMEOUT_EXPIRED:
+                    status = glClientWaitSync(fence, GL_SYNC_FLUSH_COMMANDS_BIT, WAIT_SLICE)
+                if status == GL_WAIT_FAILED:
+                    raise RuntimeError("glClientWaitSync failed on an upload fence")
+            self.frame["wait_ms"] += (time.perf_counter() - start) * 1e3
+            glDeleteSync(fence)
+            self.fences[self.segment] = None
+        self.offset = 0
+
+    def pump(self):
+        # upload queued grids, oldest first, until the frame's byte budget is spent
+        while self.queue:
+            grid = next(iter(self.queue.values()))
+            grid.prepare()
+            size = grid.vertex_data.nbytes + (grid.edges.nbytes if grid.index_dirty or grid.vbo is None else 0)
+            if self.frame["bytes"] and self.frame["bytes"] + size > self.budget:
+                break
+            self.queue.popitem(last=False)
+            self.upload(grid)
+
+    def upload(self, grid):
+        if grid.vbo is None:
+            grid.vbo, grid.ibo = (int(b) for b in glGenBuffers(2))
+            grid.index_dirty = True
+        self.stream(GL_ARRAY_BUFFER, grid.vbo, grid.vertex_data)
+        if grid.index_dirty:
+            self.stream(GL_ELEMENT_ARRAY_BUFFER, grid.ibo, grid.edges)
+            grid.uploaded_count = grid.edges.size
+        grid.index_dirty = False
+        grid.dirty = False
+        self.frame["uploads"] += 1
+
+    def stream(self, target, buffer, data):
+        data = np.ascontiguousarray(data)
+        size = data.nbytes
+        if self.persistent and self.offset + size <= self.segment_size:
+            # write into the mapped segment and let the GPU copy it into place, no driver sync on the target
+            offset = self.segment * self.segment_size + self.offset
+            ctypes.memmove(self.mapped + offset, data.ctypes.data, size)
+            glBindBuffer(GL_COPY_WRITE_BUFFER, buffer)
+            if self.allocated.get(buffer) != size:
+                glBufferData(GL_COPY_WRITE_BUFFER, size, None, GL_STATIC_DRAW)
+                self.allocated[buffer] = size
+            glBindBuffer(GL_COPY_READ_BUFFER, self.staging)
+            glCopyBufferSubData(GL_COPY_READ_BUFFER, GL_COPY_WRITE_BUFFER, offset, 0, size)
+            glBindBuffer(GL_COPY_READ_BUFFER, 0)
+            glBindBuffer(GL_COPY_WRITE_BUFFER, 0)
+            # keep copies 256 byte aligned
+            self.offset += (size + 255) & ~255
+        else:
+            # orphan the target's storage so the driver never waits on draws still reading the old contents
+            glBindBuffer(target, buffer)
+            glBufferData(target, size, None, GL_STREAM_DRAW)
+            glBufferSubData(target, 0, size, data)
+            glBindBuffer(target, 0)
+            self.allocated.pop(buffer, None)
+        self.frame["bytes"] += size
+
+    def end_frame(self):
+        if self.persistent and self.offset:
+            self.fences[self.segment] = glFenceSync(GL_SYNC_GPU_COMMANDS_COMPLETE, 0)
+        self.segment = (self.segment + 1) % self.segments
+        self.frames += 1
+        for key, value in self.frame.items():
+            self.totals[key] += value
+
+    def forget(self, buffers):
+        # buffers deleted by their owner
+        for buffer in buffers:
+            self.allocated.pop(buffer, None)
+
+    def stats(self):
+        # this frame's uploads, plus running totals
+        return dict(self.frame, pending=self.pending, frames=self.frames,
+                    **{f"total_{key}": value for key, value in self.totals.items()})
+
+    def release(self):
+        for i, fence in enumerate(self.fences):
+            if fence is not None:
+                glDeleteSync(fence)
+                self.fences[i] = None
+        if self.staging is not None:
+            glBindBuffer(GL_COPY_READ_BUFFER, self.staging)
+            glUnmapBuffer(GL_COPY_READ_BUFFER)
+            glBindBuffer(GL_COPY_READ_BUFFER, 0)
+            glDeleteBuffers(1, [self.staging])
+            self.staging = None
+        self.queue.clear()
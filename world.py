@@ -1,28 +1,305 @@
-from grid import Grid
+import numpy as np
+from OpenGL.GL import glPushMatrix, glPopMatrix, glMultMatrixf
+from grid import Grid, InstancedGrid, ProceduralGrid
+from culling import SpatialHash
+from lod import LodGrid
+from scene import SceneGraph, SceneNode
+from batching import StaticBatch
+
+
+def lattices(objects, boxes):
+    # per object: its (x, z) min corner, lattice spacing (nan without one) and cell counts
+    lo = boxes[:, 0, [0, 2]]
+    spacing = np.array([getattr(obj, 'spacing', np.nan) for obj in objects], dtype=np.float64)
+    with np.errstate(invalid='ignore'):
+        counts = np.maximum(np.round((boxes[:, 1, [0, 2]] - lo) / spacing[:, None]), 1)
+    return lo, spacing, np.nan_to_num(counts, nan=1).astype(int)
+
+
+class RayHits:
+    __slots__ = ('distance', 'points', 'objects', 'cells')
+
+    def __init__(self, distance, points, objects, cells):
+        # per ray: distance (inf on a miss), hit point, object hit (None on a miss) and its lattice cell (i, j),
+        # (-1, -1) where the object has no lattice
+        self.distance = distance
+        self.points = points
+        self.objects = objects
+        self.cells = cells
+
+    @property
+    def hit(self):
+        return np.isfinite(self.distance)
+
 
 class World:
-    def __init__(self, map_size):
+    def __init__(self, map_size, radius=1, instanced=False, grid_sq=10, lod_levels=1, lod_bias=1.0,
+                 render_mode="geometry", view_distance=100, terrain=None,
+                 store=None):
         self.map_size = map_size
+        # "geometry" draws grid meshes, "batched" merges them into one welded mesh,
+        # "procedural" shades the endless lattice on ground planes in one pass
+        self.render_mode = render_mode
+        self.view_distance = view_distance
+        self.procedural = None
+        self.batch = None
+        # a TerrainGenerator turns the flat grids into heightfield chunks
+        self.terrain = terrain
+        # a ChunkStore loads previously built chunks from disk and keeps new ones
+        self.store = store
+        self.radius = radius
+        self.instanced = instanced
+        self.grid_sq = grid_sq
+        # more than one level keeps coarser copies of each grid for distant cells
+        self.lod_levels = lod_levels
+        self.lod_bias = lod_bias
+        self.line_count = 0
         self.objects = []
+        # objects with bounds are indexed for culling, the rest are always drawn
+        self.index = SpatialHash(map_size)
+        self.unbounded = []
+        self.visible_count = 0
+        self.culled_count = 0
+        # placed objects hang off scene nodes and move by matrix, not by rewriting their vertices
+        self.scene = SceneGraph()
+        # floating render origin: GL only sees positions relative to it, each object is placed by one offset
+        self.origin = np.zeros(3)
+        self.placements = {}
+        self.ray_cache = None
+        # an UploadRing streams this world's grid buffers under a per-frame budget, None uploads them on draw
+        self.uploader = None
         
     def add_object(self, obj):
         self.objects.append(obj)
+        self.placements[id(obj)] = self.placement(obj)
+        if hasattr(obj, 'bounds'):
+            self.index.insert(obj, obj.bounds())
+        else:
+            self.unbounded.append(obj)
+
+    def remove_object(self, obj):
+        self.objects.remove(obj)
+        self.placements.pop(id(obj), None)
+        if obj in self.unbounded:
+            self.unbounded.remove(obj)
+        else:
+            self.index.remove(obj)
+
+    def add_static(self, obj):
+        # stationary grids join the merged batch instead of drawing on their own
+        if self.batch is None:
+            self.batch = StaticBatch()
+            self.add_object(self.batch)
+        self.batch.add(obj)
+        self.index.insert(self.batch, self.batch.bounds())
+
+    def remove_static(self, obj):
+        if self.batch is None or obj not in self.batch:
+            return
+        self.batch.remove(obj)
+        if len(self.batch) == 0:
+            # the next static grid starts a fresh batch
+            self.remove_object(self.batch)
+            self.batch = None
+        else:
+            self.index.insert(self.batch, self.batch.bounds())
+
+    def add_node(self, obj, translation=(0, 0, 0), rotation=None, parent=None):
+        node = self.scene.add(SceneNode(obj, translation, rotation), parent)
+        self.sync_scene()
+        # an empty node only groups its children
+        if obj is None:
+            return node
+        if node.local_bounds is None:
+            self.objects.append(node)
+            self.placements[id(node)] = None
+            self.unbounded.append(node)
+        else:
+            self.add_object(node)
+        return node
+
+    def sync_scene(self):
+        # only nodes whose transforms changed since the last sync are recomputed and reindexed
+        for node in self.scene.update():
+            if id(node) in self.index.entries:
+                self.index.insert(node, node.bounds())
+
+    def remove_node(self, node):
+        self.scene.remove(node)
+        for child in [node, *self.descendants(node)]:
+            if child in self.objects:
+                self.remove_object(child)
+
+    def descendants(self, node):
+        for child in node.children:
+            yield child
+            yield from self.descendants(child)
+
+    def placement(self, obj):
+        # column-major float32 offset from the render origin to the object's own origin, None for no offset
+        origin = getattr(obj, 'origin', None)
+        offset = -self.origin if origin is None else origin - self.origin
+        if not np.any(offset):
+            return None
+        matrix = np.identity(4, dtype=np.float32)
+        matrix[3, :3] = offset
+        return matrix
+
+    def rebase(self, origin):
+        # move the render origin, one offset per loaded object and no vertex data touched
+        self.origin = np.asarray(origin, dtype=np.float64)
+        self.placements = {id(obj): self.placement(obj) for obj in self.objects}
+
+    def raycast(self, origins, directions, max_distance=np.inf):
+        # nearest object along each of R rays, (R, 3) origins and directions
+        origins = np.asarray(origins, dtype=np.float64).reshape(-1, 3)
+        directions = np.asarray(directions, dtype=np.float64).reshape(-1, 3)
+        directions = directions / np.linalg.norm(directions, axis=1, keepdims=True)
+        distance, index, struck = self.index.raycast(origins, directions, max_distance)
+        hit = index >= 0
+        points = np.full(origins.shape, np.nan)
+        points[hit] = origins[hit] + directions[hit] * distance[hit, None]
+
+        # lattice cell of each hit in x, z, counted from the struck object's min corner
+        objects, boxes = self.index.boxes()[:2]
+        if self.ray_cache is None or self.ray_cache[0] is not objects:
+            self.ray_cache = (objects, np.array([hasattr(obj, 'raycast') for obj in objects], dtype=bool),
+                              *lattices(objects, boxes))
+        _, narrow, lo, spacing, counts = self.ray_cache
+        rays = np.flatnonzero(hit)
+        i = index[rays]
+        lo, spacing, counts = lo[i], spacing[i], counts[i]
+        # a refining object may strike something finer than itself, like one member of a static batch
+        members = np.flatnonzero(narrow[i])
+        members = members[[struck[rays[m]] is not objects[i[m]] for m in members.tolist()]]
+        if members.size:
+            member_objects = struck[rays[members]]
+            member_boxes = {}
+            for obj in member_objects:
+                if id(obj) not in member_boxes:
+                    member_boxes[id(obj)] = obj.bounds()
+            member_boxes = np.array([member_boxes[id(obj)] for obj in member_objects]).reshape(-1, 2, 3)
+            lo[members], spacing[members], counts[members] = lattices(member_objects, member_boxes)
+        cells = np.full((origins.shape[0], 2), -1)
+        lattice = np.isfinite(spacing)
+        cell = np.floor((points[rays[lattice]][:, [0, 2]] - lo[lattice]) / spacing[lattice, None]).astype(int)
+        cells[rays[lattice]] = np.clip(cell, 0, counts[lattice] - 1)
+        return RayHits(distance, points, struck, cells)
+
+    def ground(self, positions, max_distance=np.inf):
+        # the first surface straight below each position
+        positions = np.asarray(positions, dtype=np.float64).reshape(-1, 3)
+        return self.raycast(positions, np.broadcast_to([0.0, -1.0, 0.0], positions.shape), max_distance)
+
+    def set_objects(self, objects):
+        self.objects = []
+        self.placements = {}
+        self.index.clear()
+        self.unbounded = []
+        for obj in objects:
+            self.add_object(obj)
+
+    def neighbor_offsets(self):
+        # world offsets of every cell within radius, center cell first
+        r = np.arange(-self.radius, self.radius + 1)
+        cells = np.stack(np.meshgrid(r, r, r, indexing='ij'), axis=-1).reshape(-1, 3)
+        cells = cells[np.argsort(np.abs(cells).sum(axis=1), kind='stable')]
+        return cells * self.map_size
         
+    def make_grid(self):
+        if self.lod_levels > 1:
+            return LodGrid(self.grid_sq, self.lod_levels)
+        return Grid(self.grid_sq)
+
+    def make_chunk(self, cell):
+        grid = self.make_grid()
+        grid.origin = np.array(cell, dtype=np.float64) * self.map_size
+        return grid
+
+    def build_cells(self, cells):
+        # stored chunks first, then the rest built (terrain chunks all in parallel) and stored
+        chunks = {}
+        if self.store is not None:
+            for cell in cells:
+                chunk = self.store.get(cell)
+                if chunk is not None:
+                    chunks[cell] = chunk
+        missing = [cell for cell in cells if cell not in chunks]
+        if self.terrain is not None:
+            built = self.terrain.build_many(missing)
+        else:
+            built = [self.make_chunk(cell) for cell in missing]
+        for cell, chunk in zip(missing, built):
+            chunks[cell] = chunk
+            if self.store is not None and isinstance(chunk, Grid):
+                self.store.put(cell, chunk)
+        return [chunks[cell] for cell in cells]
+
     def construct_map(self):
-        # create main grid
-        center_grid = Grid()
-        self.add_object(center_grid)
-        
-        # create grids for all 26 neighbors
-        for x in range(-1, 2):
-            for y in range(-1, 2):
-                for z in range(-1, 2):
-                    if x == 0 and y == 0 and z == 0:
-                        continue
-                    grid = Grid()
-                    grid.move_grid((x * self.map_size, y * self.map_size, z * self.map_size))
-                    self.add_object(grid)
+        if self.render_mode == "procedural":
+            layers = range(-self.radius, self.radius + 1)
+            self.procedural = ProceduralGrid(self.map_size, self.grid_sq, layers=layers, extent=self.view_distance)
+            return
+
+        offsets = self.neighbor_offsets()
+
+        # share one lattice across all neighbors and draw it as instances
+        if self.instanced:
+            self.add_object(InstancedGrid(Grid(self.grid_sq), offsets))
+            return
+
+        if self.render_mode == "batched":
+            for offset in offsets:
+                grid = Grid(self.grid_sq)
+                grid.move_grid(tuple(offset))
+                self.add_static(grid)
+            return
+
+        # create the main grid, then grids for all neighbors
+        cells = [tuple(int(c) for c in offset // self.map_size) for offset in offsets]
+        for chunk in self.build_cells(cells):
+            self.add_object(chunk)
                     
-    def render(self):
-        for obj in self.objects:
-            obj.draw()
\ No newline at end of file
+    def render(self, frustum=None, eye=None):
+        self.submit(self.prepare_frame(frustum, eye), None if eye is None else eye - self.origin)
+
+    def prepare_frame(self, frustum=None, eye=None):
+        # the cpu side of a frame, no GL: returns the (drawable, matrix or None) pairs to submit
+        self.sync_scene()
+
+        # without a frustum everything is drawn
+        visible = self.objects if frustum is None else self.index.query(frustum) + self.unbounded
+        self.visible_count = len(visible)
+        self.culled_count = len(self.objects) - len(visible)
+        line_count = 0
+        items = []
+        for obj in visible:
+            # pick each visible object's level of detail from its distance to the eye
+            if eye is not None and hasattr(obj, 'select_level'):
+                obj.select_level(eye, self.lod_bias)
+            line_count += getattr(obj, 'index_count', 0) // 2
+            # resolve the level and transform now, so later changes don't reach a frame already prepared
+            drawable, matrix = obj.draw_item(self.origin) if hasattr(obj, 'draw_item') else (obj, None)
+            items.append((drawable, self.placements.get(id(obj)) if matrix is None else matrix))
+        self.line_count = line_count
+        return items
+
+    def submit(self, items, eye=None):
+        # the GL side of a frame, eye in render space
+        if self.procedural is not None:
+            self.procedural.draw(eye if eye is not None else (0, 0, 0))
+        for obj, matrix in items:
+            if matrix is None:
+                self.draw_object(obj)
+            else:
+                glPushMatrix()
+                glMultMatrixf(matrix)
+                self.draw_object(obj)
+                glPopMatrix()
+
+    def draw_object(self, obj):
+        # drawables only take the upload ring when there is one, so plain draw() objects still work
+        if self.uploader is None:
+            obj.draw()
+        else:
+            obj.draw(self.uploader)